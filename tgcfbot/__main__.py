@@ -1,6 +1,10 @@
+import functools
 import logging
 import os
-from typing import Callable
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
 from uuid import uuid4
 
 from telegram import (
@@ -9,7 +13,6 @@ from telegram import (
     InputTextMessageContent
 )
 from telegram.ext import (
-    Updater,
     CommandHandler,
     CallbackContext,
     InlineQueryHandler,
@@ -18,11 +21,21 @@ from telegram.ext import (
 
 from . import codeforces_api as cf
 from . import constants
+from . import metrics
 from . import util
-from .database import Database
+from .feed import SubmissionFeed
+from .jobs import ProblemsetRefresher, ProfileRefresher
+from .outbox import BROADCAST, Outbox
+from .standings import StandingsTracker
+from .votes import VoteBuffer
+from .webhook import WebhookUpdater
+from .workers import BoundedPool
+from .cache import TTLCache
+from .database import Database, rating_band
+from .disk_cache import ResponseCache
 
 logging.basicConfig(
-    format='[%(levelname)s] %(name)s - %(message)s', level=logging.DEBUG
+    format='[%(levelname)s] %(name)s - %(message)s', level=os.getenv('LOG_LEVEL', 'INFO')
 )
 
 logger = logging.getLogger('tgcfbot')
@@ -30,58 +43,141 @@ logger = logging.getLogger('tgcfbot')
 token = os.getenv('TOKEN')     # telegram bot token
 db_url = os.getenv('DB_URL')   # mongodb url
 admins = set(map(int, os.getenv('ADMINS').split(':')))  # telegram id of admins
+cf_rate = float(os.getenv('CF_RATE', '0.5'))  # codeforces calls per second
+cf_burst = float(os.getenv('CF_BURST', '1'))
+cf_cache_path = os.getenv('CF_CACHE_PATH')  # sqlite file caching codeforces responses
+
+cf.client = cf.Client(
+    rate=cf_rate,
+    burst=cf_burst,
+    cache=ResponseCache(cf_cache_path) if cf_cache_path else None
+)
+
+inline_cache_size = int(os.getenv('INLINE_CACHE_SIZE', '1024'))
+inline_cache_ttl = float(os.getenv('INLINE_CACHE_TTL', '300'))  # seconds
+inline_cache_time = int(os.getenv('INLINE_CACHE_TIME', '10'))  # telegram side cache seconds
+inline_is_personal = os.getenv('INLINE_IS_PERSONAL', '') == '1'
+refresh_interval = float(os.getenv('REFRESH_INTERVAL', '21600'))  # problemset refresh seconds
+profile_interval = float(os.getenv('PROFILE_INTERVAL', '3600'))  # registered profiles refresh seconds
+slow_workers = int(os.getenv('SLOW_WORKERS', '4'))  # threads for codeforces bound handlers
+slow_queue = int(os.getenv('SLOW_QUEUE', '32'))      # waiting slow handlers before refusing
+workers = int(os.getenv('WORKERS', '4'))              # dispatcher threads
+
+mode = os.getenv('MODE', 'polling')  # polling or webhook
+webhook_listen = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+webhook_port = int(os.getenv('WEBHOOK_PORT', '8443'))
+webhook_path = os.getenv('WEBHOOK_PATH', 'telegram')
+webhook_url = os.getenv('WEBHOOK_URL')       # public url telegram posts to, e.g. behind a proxy
+webhook_secret = os.getenv('WEBHOOK_SECRET')
+webhook_connections = int(os.getenv('WEBHOOK_CONNECTIONS', '40'))
+webhook_retries = int(os.getenv('WEBHOOK_RETRIES', '5'))  # set_webhook retries, negative for ever
+metrics_port = int(os.getenv('METRICS_PORT', '0'))  # prometheus endpoint, 0 disables it
+metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+standings_interval = float(os.getenv('STANDINGS_INTERVAL', '60'))  # live standings seconds
+feed_interval = float(os.getenv('FEED_INTERVAL', '30'))  # submission feed poll seconds
+feed_share = float(os.getenv('FEED_SHARE', '0.5'))       # part of CF_RATE the feed may use
+feed_count = int(os.getenv('FEED_COUNT', '10'))          # newest submissions fetched per handle
+send_rate = float(os.getenv('SEND_RATE', '25'))          # outgoing telegram messages per second
+send_workers = int(os.getenv('SEND_WORKERS', '4'))       # threads sending to telegram
+vote_flush_interval = float(os.getenv('VOTE_FLUSH_INTERVAL', '1'))  # seconds votes wait for a write
+edit_delay = float(os.getenv('EDIT_DELAY', '1'))  # seconds scoreboard edits of a message collapse
 
 _commands: dict[str, Callable] = {}
 db = Database(db_url=db_url)
+inline_cache = TTLCache(maxsize=inline_cache_size, ttl=inline_cache_ttl)
+refresher = ProblemsetRefresher(db, on_change=inline_cache.clear)
+profile_refresher = ProfileRefresher(db)
+slow_pool = BoundedPool(workers=slow_workers, max_queue=slow_queue, name='slow')
+standings_tracker = StandingsTracker(db, ttl=standings_interval / 2)
+outbox = Outbox(global_rate=send_rate, workers=send_workers)
+votes = VoteBuffer(db, on_flush=lambda mentions: list(map(inline_cache.invalidate, mentions)))
+feed = SubmissionFeed(db, budget=max(1, int(cf_rate * feed_interval * feed_share)), count=feed_count)
 
 
 def command(cmd: str) -> Callable:
     def wrapper(func: Callable) -> Callable:
-        _commands[cmd] = func
+        _commands[cmd] = metrics.timer('handler', cmd)(func)
         return func
 
     return wrapper
 
 
+def reply(update: Update, *args, **kwargs) -> Future:
+    # replies go through the outbox, the returned future resolves to the message
+    func = functools.partial(update.message.reply_text, *args, **kwargs)
+    return outbox.submit(update.effective_chat.id, func)
+
+
+def slow(func: Callable = None, *,
+         check: Callable[[Update, CallbackContext], Optional[str]] = None) -> Callable:
+    # run codeforces bound handlers off the dispatcher threads; check, if
+    # given, rejects bad arguments with a message before taking a pool slot
+    if func is None:
+        return functools.partial(slow, check=check)
+    timed_func = metrics.timer('slow', func.__name__)(func)
+
+    @functools.wraps(func)
+    def wrapper(update: Update, ctx: CallbackContext) -> None:
+        if check and (error := check(update, ctx)):
+            reply(update, error)
+            return
+        # the task starts once the acknowledgement is queued ahead of its replies
+        acked = threading.Event()
+
+        def task() -> None:
+            acked.wait()
+            timed_func(update, ctx)
+
+        if slow_pool.submit(task) is None:
+            reply(update, 'too busy, try again later')
+            return
+        reply(update, 'working on it...')
+        acked.set()
+
+    return wrapper
+
+
 @command('start')
 def start(update: Update, _: CallbackContext) -> None:
-    update.message.reply_text('Hi!')
+    reply(update, 'Hi!')
+
+
+def check_register(_: Update, ctx: CallbackContext) -> Optional[str]:
+    if not ctx.args:
+        return 'handle is empty'
+    if ctx.args[0] in constants.limited_handles:
+        return 'sagzan found'
+    return None
 
 
 @command('register')
+@slow(check=check_register)
 def register(update: Update, ctx: CallbackContext) -> None:
-    if not ctx.args:
-        update.message.reply_text('handle is empty')
-        return
     handle = ctx.args[0]
-    if handle in constants.limited_handles:
-        update.message.reply_text('sagzan found')
-        return
     try:
         cf_user, = cf.user.info(handles=[handle])
         db.register_user(update.effective_user, cf_user)
     except cf.APIError:
-        update.message.reply_text('codeforces api error')
+        reply(update, 'codeforces api error')
         raise
     else:
-        update.message.reply_text(f'register "{handle}"')
+        reply(update, f'register "{handle}"')
 
 
 @command('gimme')
+@slow
 def gimme(update: Update, ctx: CallbackContext) -> None:
     if tags := util.complete_tags(ctx.args):
         tag_list = '", "'.join(tags)
-        update.message.reply_text(text=f'looking for problems with tags: "{tag_list}"')
+        reply(update, text=f'looking for problems with tags: "{tag_list}"')
 
     exclude = None
     min_rating = 0
     max_rating = 1800
 
     if cf_user := db.get_cf_user(update.effective_user.id):
-        submissions = cf.user.status(handle=cf_user.handle)
         # exclude solved problems
-        solved = [s.problem for s in submissions if s.verdict == cf.Verdict.OK]
-        exclude = [p.mention for p in util.valid_problems(solved)]
+        exclude = util.solved_problems(db, cf_user.handle)
         if cf_user.rating:
             min_rating = cf_user.rating - 100
             max_rating = cf_user.rating + 300
@@ -92,60 +188,239 @@ def gimme(update: Update, ctx: CallbackContext) -> None:
         min_rating=min_rating,
         max_rating=max_rating
     )
-    update.message.reply_text(
+    if problem is None:
+        reply(update, 'no problem found')
+        return
+    reply(
+        update,
         text=problem.html,
         parse_mode='HTML',
-        reply_markup=util.score_markup(db, problem.mention),
+        reply_markup=util.scores_markup(problem.mention, votes.get_scores(problem.mention)),
         disable_web_page_preview=True,
     )
 
 
+@command('top')
+def top(update: Update, ctx: CallbackContext) -> None:
+    ratings = [arg for arg in ctx.args if arg.isdigit()]
+    band = rating_band(int(ratings[0])) if ratings else 'all'
+    tag = ' '.join(arg for arg in ctx.args if not arg.isdigit()).lower() or 'all'
+    if tag != 'all' and tag not in constants.tags:
+        if not (tags := util.complete_tags([tag])):
+            reply(update, f'unknown tag "{tag}"')
+            return
+        tag = tags[0]
+
+    entries = db.get_leaderboard(tag, band)
+    if not entries:
+        reply(update, 'no voted problem here yet')
+        return
+    like, dislike = constants.emojis['like'], constants.emojis['dislike']
+    lines = [f'top problems, tag {tag}, rating {band}:'] + [
+        f'{i}. {e["html"]} {like} {e["like"]} {dislike} {e["dislike"]}'
+        for i, e in enumerate(entries, start=1)
+    ]
+    reply(update, text='\n'.join(lines), parse_mode='HTML', disable_web_page_preview=True)
+
+
+def check_standings(_: Update, ctx: CallbackContext) -> Optional[str]:
+    if not ctx.args or not ctx.args[0].isdigit():
+        return 'usage: /standings <contest id> [live]'
+    return None
+
+
+@command('standings')
+@slow(check=check_standings)
+def standings(update: Update, ctx: CallbackContext) -> None:
+    contest_id = int(ctx.args[0])
+    try:
+        text = standings_tracker.render(contest_id)
+    except cf.APIError as err:
+        reply(update, f'codeforces api error: {err}')
+        return
+    future = reply(update, text=text, parse_mode='HTML')
+    if ctx.args[1:] == ['live']:
+        def watch(sent: Future) -> None:
+            if sent.exception() is None:
+                message = sent.result()
+                standings_tracker.watch(contest_id, message.chat_id, message.message_id, text)
+
+        future.add_done_callback(watch)
+
+
+@metrics.timer('job')
+def poll_standings(ctx: CallbackContext) -> None:
+    for edit in standings_tracker.poll():
+        outbox.submit(edit.chat_id, functools.partial(
+            ctx.bot.edit_message_text,
+            chat_id=edit.chat_id,
+            message_id=edit.message_id,
+            text=edit.text,
+            parse_mode='HTML'
+        ), priority=BROADCAST)
+
+
+@command('subscribe')
+def subscribe(update: Update, _: CallbackContext) -> None:
+    if db.subscribe(update.effective_chat.id):
+        reply(update, 'subscribed to solves of registered users')
+    else:
+        reply(update, 'already subscribed')
+
+
+@command('unsubscribe')
+def unsubscribe(update: Update, _: CallbackContext) -> None:
+    if db.unsubscribe(update.effective_chat.id):
+        reply(update, 'unsubscribed')
+    else:
+        reply(update, 'not subscribed')
+
+
+@metrics.timer('job')
+def poll_feed(ctx: CallbackContext) -> None:
+    try:
+        solves = feed.poll()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('submission feed failed')
+        return
+    if not solves:
+        return
+    # keep each message well under telegram's 4096 characters
+    texts = ['\n'.join(solve.html for solve in solves[i:i + 20]) for i in range(0, len(solves), 20)]
+    for chat_id in db.get_subscribers():
+        for text in texts:
+            outbox.submit(chat_id, functools.partial(
+                ctx.bot.send_message,
+                chat_id=chat_id,
+                text=text,
+                parse_mode='HTML',
+                disable_web_page_preview=True
+            ), priority=BROADCAST)
+
+
 @command('update')
-def update_cmd(update: Update, _: CallbackContext) -> None:
+def update_cmd(update: Update, ctx: CallbackContext) -> None:
     if update.effective_user.id in admins:
-        update.message.reply_text('update started')
-        problems, _ = cf.problemset.problems()
-        inserted = db.insert_problems(problems, forced=True)
-        update.message.reply_text(f'update done with {inserted} new problems')
+        reply(update, 'update started')
+        ctx.job_queue.run_once(refresh_problems, 0, context=update.effective_chat.id)
 
 
-def inline_query(update: Update, _: CallbackContext) -> None:
-    query = update.inline_query.query
-    problems = db.query_problem(query, max_count=10)
-    result = [
-        InlineQueryResultArticle(
-            id=str(uuid4()),
-            title=problem.mention,
-            description=problem.display_name,
-            thumb_url='https://sta.codeforces.com/s/54849/images/codeforces-telegram-square.png',
-            input_message_content=InputTextMessageContent(
-                message_text=problem.html,
-                parse_mode='HTML',
-                disable_web_page_preview=True,
-            ),
-            reply_markup=util.score_markup(db, problem.mention),
-        )
-        for problem in problems
-    ]
+@command('update_status')
+def update_status(update: Update, _: CallbackContext) -> None:
+    if update.effective_user.id in admins:
+        if (last_run := refresher.last_run) is None:
+            reply(update, 'no update has run yet')
+            return
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_run.started))
+        lines = [f'last update at {started} took {last_run.duration:.1f}s: {last_run.status}']
+        if (profiles := profile_refresher.last_run) is not None:
+            lines.append(f'last profile refresh took {profiles.duration:.1f}s: {profiles.status}')
+        reply(update, '\n'.join(lines))
+
+
+@command('stats')
+def stats(update: Update, ctx: CallbackContext) -> None:
+    # /stats database shows the timings of one kind only
+    if update.effective_user.id in admins:
+        kind = ctx.args[0] if ctx.args else None
+        lines = metrics.registry.summary(kind)
+        if kind is None:
+            client = ', '.join(f'{key} {value:g}' for key, value in cf.client.stats().items())
+            lines += [
+                f'codeforces client: {client}',
+                f'outbox: {outbox.pending()} pending',
+                f'votes: {votes.pending()} unwritten'
+            ]
+        for text in util.join_messages(lines) or [f'no {kind} timings yet']:
+            reply(update, text)
+
+
+@command('explain')
+def explain(update: Update, _: CallbackContext) -> None:
+    if update.effective_user.id in admins:
+        lines = [
+            f'ERROR {plan.name}: {plan.error}' if plan.error else
+            f'{"COLLSCAN " if plan.collscan else ""}{plan.name}: {" <- ".join(plan.stages)}'
+            for plan in db.explain_queries()
+        ]
+        reply(update, '\n'.join(lines))
+
+
+@metrics.timer('job')
+def refresh_problems(ctx: CallbackContext) -> None:
+    # a job context holds the chat of the admin who asked for it
+    chat_id = ctx.job.context
+    status = refresher.run(force=chat_id is not None)
+    if chat_id is not None:
+        outbox.submit(chat_id, functools.partial(
+            ctx.bot.send_message, chat_id=chat_id, text=f'update done: {status}'
+        ))
+
+
+@metrics.timer('job')
+def refresh_profiles(_: CallbackContext) -> None:
+    profile_refresher.run()
 
-    update.inline_query.answer(result, cache_time=10)  # TODO: change 10 to higher on deploy
 
+@metrics.timer('job')
+def flush_votes(_: CallbackContext) -> None:
+    votes.flush()
 
+
+@metrics.timer('handler')
+def inline_query(update: Update, _: CallbackContext) -> None:
+    query = ' '.join(update.inline_query.query.lower().split())
+    result = inline_cache.get(query)
+    if result is None:
+        generation = inline_cache.generation()
+        problems = db.query_problem(query, max_count=10)
+        scores = votes.get_scores_many([problem.mention for problem in problems])
+        result = [
+            InlineQueryResultArticle(
+                id=str(uuid4()),
+                title=problem.mention,
+                description=problem.display_name,
+                thumb_url='https://sta.codeforces.com/s/54849/images/codeforces-telegram-square.png',
+                input_message_content=InputTextMessageContent(
+                    message_text=problem.html,
+                    parse_mode='HTML',
+                    disable_web_page_preview=True,
+                ),
+                reply_markup=util.scores_markup(problem.mention, scores[problem.mention]),
+            )
+            for problem in problems
+        ]
+        # vote changes of a problem drop every cached answer showing it, an
+        # answer built while votes were written is not cached at all
+        inline_cache.set(query, result, tags=[problem.mention for problem in problems],
+                         generation=generation)
+
+    update.inline_query.answer(result, cache_time=inline_cache_time, is_personal=inline_is_personal)
+
+
+@metrics.timer('handler')
 def callback_query(update: Update, _: CallbackContext) -> None:
     query = update.callback_query
 
     try:
         mention, title = query.data.split()
         assert title in constants.emojis.keys(), ValueError('not registered emoji')
-        flag = db.toggle_score(mention, title, query.from_user.id)
+        flag = votes.toggle(mention, title, query.from_user.id)
+
+        # clicks on one message within edit_delay end in a single edit
+        if query.message:
+            chat_id, key = query.message.chat_id, (query.message.chat_id, query.message.message_id)
+        else:
+            chat_id = key = query.inline_message_id
 
         # Note: this is a wrong behavior
         # client can send bad callback query data and
         # then bot add scoreboard of a problem to the
         # message of other problem
-        query.edit_message_reply_markup(
-            reply_markup=util.score_markup(db, mention)
-        )
+        outbox.submit_latest(key, chat_id, functools.partial(
+            query.edit_message_reply_markup,
+            reply_markup=util.scores_markup(mention, votes.get_scores(mention))
+        ), delay=edit_delay)
 
         if flag:
             query.answer(text=f'you vote {constants.emojis[title]} for {mention}')
@@ -158,7 +433,7 @@ def callback_query(update: Update, _: CallbackContext) -> None:
 
 
 def main() -> None:
-    updater = Updater(token)
+    updater = WebhookUpdater(token, workers=workers, secret_token=webhook_secret)
     dispatcher = updater.dispatcher
 
     for cmd, callback in _commands.items():
@@ -167,9 +442,35 @@ def main() -> None:
     dispatcher.add_handler(InlineQueryHandler(inline_query))
     dispatcher.add_handler(CallbackQueryHandler(callback_query))
 
-    updater.start_polling()
+    if metrics_port:
+        metrics.serve_prometheus(metrics_port, metrics_host)
+    outbox.start()
+
+    db.ensure_indexes()
+    db.migrate_scores()
+    db.rebuild_leaderboard()
+    updater.job_queue.run_repeating(refresh_problems, interval=refresh_interval, first=0)
+    updater.job_queue.run_repeating(refresh_profiles, interval=profile_interval, first=60)
+    updater.job_queue.run_repeating(poll_standings, interval=standings_interval)
+    updater.job_queue.run_repeating(poll_feed, interval=feed_interval)
+    updater.job_queue.run_repeating(flush_votes, interval=vote_flush_interval)
+
+    if mode == 'webhook':
+        updater.start_webhook(
+            listen=webhook_listen,
+            port=webhook_port,
+            url_path=webhook_path,
+            webhook_url=webhook_url,
+            bootstrap_retries=webhook_retries,
+            max_connections=webhook_connections,
+        )
+    else:
+        updater.start_polling()
     updater.idle()
 
+    slow_pool.shutdown()
+    votes.flush()
+    outbox.stop()
     db.close()
 
 
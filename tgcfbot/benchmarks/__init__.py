@@ -0,0 +1,13 @@
+import timeit
+from typing import Callable
+
+
+def measure(func: Callable, make_args: Callable[[], tuple], number: int) -> float:
+    """best time of `number` runs, argument preparation excluded"""
+    best = float('inf')
+    for _ in range(number):
+        args = make_args()
+        start = timeit.default_timer()
+        func(*args)
+        best = min(best, timeit.default_timer() - start)
+    return best
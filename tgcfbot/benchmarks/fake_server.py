@@ -0,0 +1,91 @@
+"""A local stand-in for the Codeforces API serving fixtures.
+
+    python -m tgcfbot.benchmarks.fake_server [--port 8080] [--fixtures DIR]
+"""
+import argparse
+import contextlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from . import fixtures
+
+
+class FakeCodeforces(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], results: dict[str, Any]) -> None:
+        super().__init__(address, _Handler)
+        self.results = results
+        self.encoded: dict[str, bytes] = {}
+        self.calls: dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api'
+
+    def response(self, method: str, params: dict[str, str]) -> tuple[int, bytes]:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method not in self.results:
+            return 400, _envelope('FAILED', comment=f'{method}: unknown method')
+
+        result = self.results[method]
+        if method in ('user.status', 'contest.status') and ('from' in params or 'count' in params):
+            start = int(params.get('from', 1)) - 1
+            stop = start + int(params['count']) if 'count' in params else None
+            return 200, _envelope('OK', result=result[start:stop])
+        # big responses are encoded once
+        if method not in self.encoded:
+            self.encoded[method] = _envelope('OK', result=result)
+        return 200, self.encoded[method]
+
+
+def _envelope(status: str, **fields) -> bytes:
+    return json.dumps({'status': status, **fields}).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeCodeforces
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        url = urlsplit(self.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        code, body = self.server.response(method, params)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+@contextlib.contextmanager
+def serve(results: dict[str, Any] = None, port: int = 0) -> Iterator[FakeCodeforces]:
+    server = FakeCodeforces(('127.0.0.1', port), results if results is not None else fixtures.load())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--fixtures', help='directory of recorded <method>.json responses')
+    args = parser.parse_args()
+    with serve(fixtures.load(args.fixtures), port=args.port) as server:
+        print(f'serving on {server.base_url}')
+        threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Codeforces API responses of realistic size.
+
+Recorded responses are read from a directory holding `<method>.json` files
+with the whole api envelope, missing ones are generated deterministically.
+
+    python -m tgcfbot.benchmarks.fixtures DIR    # write generated fixtures
+"""
+import json
+import os
+import random
+import sys
+from typing import Any
+
+from .. import codeforces_api as cf
+from .. import constants
+
+PROBLEMS = 10000
+SUBMISSIONS = 50000
+ROWS = 20000
+
+
+def make_problems(count: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    problems = []
+    for i in range(count):
+        problem = {
+            'contestId': 1 + i // 6,
+            'index': 'ABCDEF'[i % 6],
+            'name': f'Problem {i}',
+            'type': cf.ProblemType.PROGRAMMING,
+            'tags': rnd.sample(constants.tags, rnd.randint(0, 4)),
+        }
+        if rnd.random() < 0.8:
+            problem['rating'] = rnd.randrange(800, 3600, 100)
+        if rnd.random() < 0.5:
+            problem['points'] = float(rnd.randrange(500, 3000, 250))
+        problems.append(problem)
+    return problems
+
+
+def make_statistics(problems: list[dict], seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {'contestId': p['contestId'], 'index': p['index'], 'solvedCount': rnd.randint(0, 50000)}
+        for p in problems
+    ]
+
+
+def make_submissions(count: int, seed: int = 0, handle: str = 'tourist') -> list[dict]:
+    rnd = random.Random(seed)
+    problems = make_problems(PROBLEMS, seed)
+    verdicts = [cf.Verdict.OK, cf.Verdict.WRONG_ANSWER, cf.Verdict.TIME_LIMIT_EXCEEDED]
+    submissions = []
+    for i in range(count, 0, -1):
+        problem = rnd.choice(problems)
+        submissions.append({
+            'id': 100000000 + i,
+            'contestId': problem['contestId'],
+            'creationTimeSeconds': 1600000000 + i * 60,
+            'relativeTimeSeconds': 2147483647,
+            'problem': problem,
+            'author': {
+                'contestId': problem['contestId'],
+                'members': [{'handle': handle}],
+                'participantType': cf.ParticipantType.PRACTICE,
+                'ghost': False,
+            },
+            'programmingLanguage': 'GNU C++17',
+            'verdict': rnd.choice(verdicts),
+            'testset': 'TESTS',
+            'passedTestCount': rnd.randint(0, 100),
+            'timeConsumedMillis': rnd.randint(0, 2000),
+            'memoryConsumedBytes': rnd.randint(0, 1 << 28),
+        })
+    return submissions
+
+
+def make_standings(count: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    contest_id = 1497
+    problems = [
+        {'contestId': contest_id, 'index': index, 'name': f'Problem {index}',
+         'type': cf.ProblemType.PROGRAMMING, 'points': points, 'tags': []}
+        for index, points in zip('ABCDEF', [500.0, 1000.0, 1500.0, 2000.0, 2500.0, 3000.0])
+    ]
+    rows = []
+    for rank in range(1, count + 1):
+        rows.append({
+            'party': {
+                'contestId': contest_id,
+                'members': [{'handle': f'user{rank}'}],
+                'participantType': cf.ParticipantType.CONTESTANT,
+                'ghost': False,
+                'room': rnd.randint(1, 100),
+                'startTimeSeconds': 1615991700,
+            },
+            'rank': rank,
+            'points': float(max(0, 10000 - rank)),
+            'penalty': 0,
+            'successfulHackCount': rnd.randint(0, 3),
+            'unsuccessfulHackCount': rnd.randint(0, 3),
+            'problemResults': [
+                {'points': p['points'] if rnd.random() < 0.5 else 0.0,
+                 'rejectedAttemptCount': rnd.randint(0, 3),
+                 'type': cf.ProblemResultType.FINAL}
+                for p in problems
+            ],
+        })
+    return {
+        'contest': {'id': contest_id, 'name': 'Codeforces Round', 'type': cf.ContestType.CF,
+                    'phase': cf.ContestPhase.FINISHED, 'frozen': False,
+                    'durationSeconds': 7200, 'startTimeSeconds': 1615991700},
+        'problems': problems,
+        'rows': rows,
+    }
+
+
+def make_user(handle: str, rating: int = 1500) -> dict:
+    return {
+        'handle': handle, 'contribution': 0, 'lastOnlineTimeSeconds': 1700000000,
+        'registrationTimeSeconds': 1500000000, 'friendOfCount': 0, 'avatar': '',
+        'titlePhoto': '', 'rank': 'specialist', 'rating': rating,
+    }
+
+
+def generate(problems: int = PROBLEMS, submissions: int = SUBMISSIONS, rows: int = ROWS) -> dict[str, Any]:
+    problems = make_problems(problems)
+    return {
+        'problemset.problems': {'problems': problems, 'problemStatistics': make_statistics(problems)},
+        'user.status': make_submissions(submissions),
+        'contest.status': make_submissions(submissions, seed=1),
+        'contest.standings': make_standings(rows),
+        'user.info': [make_user('tourist')],
+    }
+
+
+def load(directory: str = None) -> dict[str, Any]:
+    """method -> result, recorded ones from directory take precedence"""
+    fixtures = generate()
+    if directory:
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                with open(os.path.join(directory, name), encoding='utf-8') as file:
+                    fixtures[name[:-len('.json')]] = json.load(file)['result']
+    return fixtures
+
+
+def main() -> None:
+    directory, = sys.argv[1:]
+    os.makedirs(directory, exist_ok=True)
+    for method, result in generate().items():
+        with open(os.path.join(directory, f'{method}.json'), 'w', encoding='utf-8') as file:
+            json.dump({'status': 'OK', 'result': result}, file)
+
+
+if __name__ == '__main__':
+    main()
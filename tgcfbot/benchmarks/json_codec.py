@@ -0,0 +1,65 @@
+"""Compare the compiled from_json/to_json with the former reflective ones.
+
+    python -m tgcfbot.benchmarks.json_codec
+"""
+import json
+from typing import Any, get_origin, get_args
+
+from .. import codeforces_api as cf
+from . import measure
+from .fixtures import make_problems, make_submissions
+
+
+def legacy_from_json(cls: type, data: Any) -> Any:
+    if (orig := get_origin(cls)) in (list, tuple):
+        return orig(legacy_from_json(get_args(cls)[0], x) for x in data)
+
+    if cf.is_namedtuple(cls):
+        for key, typ in cls.__annotations__.items():
+            if key in data:
+                data[key] = legacy_from_json(typ, data[key])
+        return cls(**data)
+
+    return cls(data)
+
+
+def legacy_to_json(obj: Any) -> Any:
+    if isinstance(obj, list):
+        return [legacy_to_json(x) for x in obj]
+
+    if cf.is_namedtuple(obj.__class__):
+        result = {}
+        for key, value in obj._asdict().items():
+            if value is None:
+                continue
+            result[key] = legacy_to_json(value)
+        return result
+
+    return obj
+
+
+def run(number: int = 5) -> dict[str, dict[str, float]]:
+    cases = {
+        'problems': (list[cf.Problem], json.dumps(make_problems(10000))),
+        'submissions': (list[cf.Submission], json.dumps(make_submissions(50000))),
+    }
+    results = {}
+    for name, (typ, text) in cases.items():
+        objects = cf.from_json(typ, json.loads(text))
+        results[name] = {
+            'legacy_from_json': measure(legacy_from_json, lambda: (typ, json.loads(text)), number),
+            'from_json': measure(cf.from_json, lambda: (typ, json.loads(text)), number),
+            'legacy_to_json': measure(legacy_to_json, lambda: (objects,), number),
+            'to_json': measure(cf.to_json, lambda: (objects,), number),
+        }
+    return results
+
+
+def main() -> None:
+    for name, timings in run().items():
+        for key, seconds in timings.items():
+            print(f'{name:12} {key:18} {seconds * 1000:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
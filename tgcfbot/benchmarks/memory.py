@@ -0,0 +1,49 @@
+"""Memory held by decoded responses, former decoder against the current one.
+
+    python -m tgcfbot.benchmarks.memory
+"""
+import json
+import tracemalloc
+from typing import Any, Callable
+
+from .. import codeforces_api as cf
+from .fixtures import PROBLEMS, SUBMISSIONS, make_problems, make_submissions
+from .json_codec import legacy_from_json
+
+
+def retained(decode: Callable[[type, Any], Any], typ: type, text: str) -> int:
+    """bytes still allocated by the decoded objects once the raw json is gone"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    data = json.loads(text)
+    objects = decode(typ, data)
+    del data
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def run() -> dict[str, dict[str, int]]:
+    cases = {
+        'problems': (list[cf.Problem], json.dumps(make_problems(PROBLEMS)), PROBLEMS),
+        'submissions': (list[cf.Submission], json.dumps(make_submissions(SUBMISSIONS)), SUBMISSIONS),
+    }
+    results = {}
+    for name, (typ, text, count) in cases.items():
+        cf._canonical.clear()
+        results[name] = {
+            'legacy bytes/object': retained(legacy_from_json, typ, text) // count,
+            'bytes/object': retained(cf.from_json, typ, text) // count,
+        }
+    return results
+
+
+def main() -> None:
+    for name, sizes in run().items():
+        for key, size in sizes.items():
+            print(f'{name:12} {key:20} {size:8d}')
+
+
+if __name__ == '__main__':
+    main()
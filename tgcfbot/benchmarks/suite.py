@@ -0,0 +1,147 @@
+"""Offline benchmarks against a local Codeforces stand-in.
+
+    python -m tgcfbot.benchmarks.suite [--output new.json] [--compare old.json]
+
+Database benchmarks run only when BENCH_DB_URL points to a MongoDB server,
+they use (and drop) the tgcfbot_bench database.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import time
+from typing import Callable
+
+from .. import codeforces_api as cf
+from .. import util
+from ..database import Database
+from ..problem_index import ProblemIndex
+from ..search import SearchIndex
+from ..votes import VoteBuffer
+from . import fake_server, fixtures, measure
+
+HANDLE = 'tourist'
+
+
+def _timer(number: int) -> Callable[[Callable], float]:
+    return lambda func: measure(func, tuple, number)
+
+
+def bench_codec(results: dict, number: int) -> dict[str, float]:
+    timed = _timer(number)
+    problems = results['problemset.problems']['problems']
+    submissions = results['user.status']
+    return {
+        'from_json problems': timed(lambda: cf.from_json(list[cf.Problem], problems)),
+        'from_json submissions': timed(lambda: cf.from_json(list[cf.Submission], submissions)),
+    }
+
+
+def bench_api(number: int) -> dict[str, float]:
+    timed = _timer(number)
+    return {
+        'problemset.problems': timed(cf.problemset.problems),
+        'user.status': timed(lambda: cf.user.status(handle=HANDLE)),
+        'user.iter_status': timed(lambda: sum(1 for _ in cf.user.iter_status(handle=HANDLE))),
+        'contest.standings': timed(lambda: cf.contest.standings(contest_id=1497)),
+        'contest.iter_standings': timed(
+            lambda: sum(1 for _ in cf.contest.iter_standings(contest_id=1497))),
+    }
+
+
+def bench_indexes(results: dict, number: int) -> dict[str, float]:
+    timed = _timer(number * 20)
+    problems = cf.from_json(list[cf.Problem], results['problemset.problems']['problems'])
+    solved = [p.mention for p in random.Random(0).sample(problems, 2000)]
+    index = ProblemIndex(problems)
+    search = SearchIndex(problems)
+    return {
+        'ProblemIndex build': _timer(number)(lambda: ProblemIndex(problems)),
+        'SearchIndex build': _timer(number)(lambda: SearchIndex(problems)),
+        'ProblemIndex.sample': timed(
+            lambda: index.sample(tags=['dp'], exclude=solved, min_rating=1500, max_rating=1900)),
+        'SearchIndex.search mention': timed(lambda: search.search('149')),
+        'SearchIndex.search name': timed(lambda: search.search('problem 123')),
+    }
+
+
+def bench_database(db_url: str, results: dict, number: int) -> dict[str, float]:
+    timed = _timer(number)
+    db = Database(db_url=db_url, db_name='tgcfbot_bench')
+    db.client.drop_database('tgcfbot_bench')
+    try:
+        problems = cf.from_json(list[cf.Problem], results['problemset.problems']['problems'])
+        start = time.perf_counter()
+        db.sync_problems(problems)
+        timings = {'sync_problems initial': time.perf_counter() - start}
+        db.ensure_indexes()
+        db.add_solved(HANDLE, 0, [])
+        mention = problems[0].mention
+        votes = VoteBuffer(db)
+        timings.update({
+            'sync_problems unchanged': timed(lambda: db.sync_problems(problems)),
+            'sample_problem': timed(lambda: db.sample_problem(min_rating=1500, max_rating=1900)),
+            'query_problem': timed(lambda: db.query_problem('1497', max_count=10)),
+            'vote and flush': timed(lambda: (votes.toggle(mention, 'like', 1), votes.flush())),
+            'get_scores_many': timed(lambda: db.get_scores_many([p.mention for p in problems[:10]])),
+        })
+
+        def gimme() -> None:
+            exclude = util.solved_problems(db, HANDLE)
+            db.sample_problem(exclude=exclude, min_rating=1500, max_rating=1900)
+
+        db.solved.delete_many({})
+        start = time.perf_counter()
+        gimme()
+        timings['gimme first'] = time.perf_counter() - start
+        timings['gimme repeated'] = timed(gimme)
+        return timings
+    finally:
+        db.client.drop_database('tgcfbot_bench')
+        db.close()
+
+
+def run(number: int = 3) -> dict[str, float]:
+    results = fixtures.load(os.getenv('BENCH_FIXTURES'))
+    timings = {}
+    timings.update(bench_codec(results, number))
+    timings.update(bench_indexes(results, number))
+    with fake_server.serve(results) as server:
+        cf.client = cf.Client(base_url=server.base_url, rate=1e6, burst=1e6, retries=0)
+        timings.update(bench_api(number))
+        if db_url := os.getenv('BENCH_DB_URL'):
+            timings.update(bench_database(db_url, results, number))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=3, help='runs per benchmark, best is kept')
+    parser.add_argument('--output', help='write results as json')
+    parser.add_argument('--compare', help='json results of an earlier run')
+    args = parser.parse_args()
+
+    timings = run(args.number)
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            previous = json.load(file)['timings']
+
+    for name, seconds in timings.items():
+        line = f'{name:28} {seconds * 1000:10.3f} ms'
+        if name in previous:
+            line += f'  x{seconds / previous[name]:.2f}'
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'created': time.time(),
+                'python': platform.python_version(),
+                'timings': timings,
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
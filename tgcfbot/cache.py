@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable
+
+
+class TTLCache:
+    # least recently used entries are evicted first, expired ones on access;
+    # entries can be tagged and dropped together by tag. a value computed
+    # while an invalidation ran may be stale, set() skips it when given the
+    # generation() read before computing it
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any, tuple]] = OrderedDict()
+        self._tagged: dict[Hashable, set[Hashable]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                self._drop(key)
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (),
+            generation: int = None) -> bool:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._data:
+                self._drop(key)
+            tags = tuple(tags)
+            self._data[key] = (self.clock() + self.ttl, value, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+            return True
+
+    def invalidate(self, tag: Hashable) -> int:
+        with self._lock:
+            self._generation += 1
+            keys = list(self._tagged.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+            self._tagged.clear()
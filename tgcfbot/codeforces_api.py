@@ -1,26 +1,116 @@
 # pylint: disable=invalid-name
 
-from typing import Any, Iterable, NamedTuple, get_origin, get_args
+import codecs
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, get_origin, get_args
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .disk_cache import ResponseCache
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger('codeforces_api')
 
 
 def is_namedtuple(cls: type) -> bool:
     return hasattr(cls, '__annotations__')
 
 
-def from_json(cls: type, data: Any) -> "cls":
+def _identity(value: Any) -> Any:
+    return value
+
+
+# string fields taking few distinct values share a single str object
+_interned_fields = frozenset({
+    'tags', 'type', 'phase', 'kind', 'verdict', 'testset', 'programmingLanguage',
+    'participantType', 'rank', 'maxRank', 'country', 'city', 'problemsetName',
+})
+
+# objects repeated across a response (problem of every submission, members and
+# tag lists) are decoded into one shared instance
+# tuples compare equal to namedtuples of the same items, hence the type in the key
+_canonical: dict[tuple[type, Any], Any] = {}
+_canonical_limit = 1 << 17
+
+
+def _share(value: Any) -> Any:
+    if len(_canonical) >= _canonical_limit:
+        _canonical.clear()
+    return _canonical.setdefault((type(value), value), value)
+
+
+def _interner(cls: type) -> Optional[Callable[[Any], Any]]:
+    # the same field name may hold numbers in another model, e.g. rank
+    if cls is str:
+        return sys.intern
+    if get_origin(cls) is tuple and get_args(cls) == (str,):
+        return lambda data: _share(tuple(map(sys.intern, data)))
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _decoder(cls: type) -> Callable[[Any], Any]:
+    # json already gives primitive values their types, only containers
+    # and nested objects need a conversion
     if (orig := get_origin(cls)) in (list, tuple):
         assert len(get_args(cls)) == 1, 'empty or multiple args for list/tuple'
-        return orig(from_json(get_args(cls)[0], x) for x in data)
+        item = _decoder(get_args(cls)[0])
+        if item is _identity:
+            return orig
+        return lambda data: orig(map(item, data))
+
+    if is_namedtuple(cls):
+        nested = [
+            (key, key in _interned_fields and _interner(typ) or _decoder(typ))
+            for key, typ in cls.__annotations__.items()
+        ]
+        nested = [(key, decoder) for key, decoder in nested if decoder is not _identity]
+        share = _share if cls in (Problem, Member) else _identity
+
+        def decode(data: dict) -> cls:
+            kwargs = dict(data)
+            for key, decoder in nested:
+                if key in kwargs:
+                    kwargs[key] = decoder(kwargs[key])
+            return share(cls(**kwargs))
+
+        return decode
+
+    return _identity
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder(cls: type) -> Callable[[Any], Any]:
+    if (orig := get_origin(cls)) in (list, tuple):
+        item = _encoder(get_args(cls)[0])
+        if item is _identity:
+            return _identity
+        return lambda value: [item(x) for x in value]
 
     if is_namedtuple(cls):
-        for key, typ in cls.__annotations__.items():
-            if key in data:
-                data[key] = from_json(typ, data[key])
-        return cls(**data)
+        fields = [(key, _encoder(typ)) for key, typ in cls.__annotations__.items()]
+
+        def encode(obj: cls) -> dict:
+            return {
+                key: enc(value)
+                for (key, enc), value in zip(fields, obj)
+                if value is not None
+            }
+
+        return encode
 
-    return cls(data)
+    return _identity
+
+
+def from_json(cls: type, data: Any) -> "cls":
+    return _decoder(cls)(data)
 
 
 def to_json(obj: Any) -> Any:
@@ -28,12 +118,7 @@ def to_json(obj: Any) -> Any:
         return [to_json(x) for x in obj]
 
     if is_namedtuple(obj.__class__):
-        result = {}
-        for key, value in obj._asdict().items():
-            if value is None:
-                continue
-            result[key] = to_json(value)
-        return result
+        return _encoder(obj.__class__)(obj)
 
     return obj
 
@@ -196,14 +281,18 @@ class Submission(NamedTuple):
     problem: Problem
     author: Party
     programmingLanguage: str
-    verdict: str    # Verdict
     testset: str
     passedTestCount: int
     timeConsumedMillis: int
     memoryConsumedBytes: int
+    verdict: str = None  # Verdict, missing while the submission waits in queue
     contestId: int = None
     points: float = None
 
+    @property
+    def testing(self) -> bool:
+        return self.verdict in (None, Verdict.TESTING)
+
 
 class ProblemResultType:
     PRELIMINARY = 'PRELIMINARY'
@@ -233,15 +322,217 @@ class APIError(Exception):
     pass
 
 
-def send_request(method: str, params: dict) -> dict:
-    response = requests.get(
-        url=f'https://codeforces.com/api/{method}',
-        params=params
-    )
-    values = response.json()
-    if values['status'] == 'FAILED':
-        raise APIError(values['comment'])
-    return values['result']
+class Client:
+    def __init__(self,
+                 base_url: str = 'https://codeforces.com/api',
+                 rate: float = 0.5,
+                 burst: float = 1,
+                 timeout: float = 30,
+                 retries: int = 3,
+                 backoff: float = 2,
+                 pool_size: int = 10,
+                 cache: ResponseCache = None) -> None:
+        # codeforces allows at most one call per two seconds
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._stats = {'calls': 0, 'retries': 0, 'wait_seconds': 0.0, 'cache_hits': 0}
+        self._lock = threading.Lock()
+        self._revalidating: set[str] = set()
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += value
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
+
+    def get(self, method: str, params: dict, stream: bool = False) -> requests.Response:
+        with metrics.timed('codeforces', method):
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self._count('retries')
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                self._count('wait_seconds', self.bucket.acquire())
+                self._count('calls')
+                try:
+                    response = self.session.get(
+                        url=f'{self.base_url}/{method}',
+                        params=params,
+                        timeout=self.timeout,
+                        stream=stream
+                    )
+                except (requests.ConnectionError, requests.Timeout) as err:
+                    logger.warning('%s failed: %s', method, err)
+                    if attempt == self.retries:
+                        raise APIError(f'{method}: {err}') from err
+                    continue
+
+                if response.status_code < 400:
+                    return response
+                comment = _failure_comment(response)
+                if response.status_code < 500 and 'Call limit exceeded' not in comment:
+                    raise APIError(comment)
+                logger.warning('%s failed with %d: %s', method, response.status_code, comment)
+                response.close()
+            raise APIError(comment)
+
+    def _call(self, method: str, params: dict) -> Any:
+        values = self.get(method, params).json()
+        if values['status'] == 'FAILED':
+            raise APIError(values['comment'])
+        if self.cache is not None and self.cache.cacheable(method):
+            self.cache.put(method, params, values['result'])
+        return values['result']
+
+    def _revalidate(self, method: str, params: dict) -> None:
+        key = self.cache.key(method, params)
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run() -> None:
+            try:
+                self._call(method, params)
+            except APIError:
+                logger.warning('revalidating %s failed', key, exc_info=True)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, name=f'revalidate {method}', daemon=True).start()
+
+    def call(self, method: str, params: dict, use_cache: bool = True, allow_stale: bool = True) -> Any:
+        if use_cache and self.cache is not None and self.cache.cacheable(method):
+            if (cached := self.cache.get(method, params)) is not None:
+                result, fresh = cached
+                if fresh or allow_stale:
+                    self._count('cache_hits')
+                    if not fresh:
+                        self._revalidate(method, params)
+                    return result
+        return self._call(method, params)
+
+
+def _failure_comment(response: requests.Response) -> str:
+    try:
+        return response.json()['comment']
+    except (ValueError, KeyError, TypeError):
+        return f'HTTP {response.status_code}'
+
+
+client = Client()
+
+
+def send_request(method: str, params: dict, use_cache: bool = True, allow_stale: bool = True) -> Any:
+    return client.call(method, params, use_cache=use_cache, allow_stale=allow_stale)
+
+
+class _JSONStream:
+    # incremental reader over a json text given in chunks, values
+    # are decoded one at a time so big arrays never sit in memory whole
+
+    def __init__(self, chunks: Iterable[str]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+
+    def _fill(self) -> bool:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\n\r':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError('unexpected end of json')
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f'expected one of {chars!r} but found {char!r}')
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number at the end of buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def keys(self) -> Iterator[str]:
+        # the caller consumes the value of each key before asking for the next
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def items(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._expect(',]') == ']':
+                return
+
+    def seek(self, path: Iterable[str]) -> None:
+        key, *rest = path
+        for name in self.keys():
+            if name == key:
+                if rest:
+                    self.seek(rest)
+                return
+            value = self.value()
+            if name == 'comment':
+                raise APIError(value)
+        raise APIError(f'no {key} in response')
+
+
+def _iter_result(method: str, params: dict, path: Iterable[str] = ()) -> Iterator[Any]:
+    response = client.get(method, params, stream=True)
+    try:
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        stream = _JSONStream(
+            decoder.decode(chunk) for chunk in response.iter_content(chunk_size=1 << 16)
+        )
+        stream.seek(['result', *path])
+        yield from stream.items()
+    finally:
+        response.close()
 
 
 class contest:
@@ -284,6 +575,27 @@ class contest:
             from_json(list[RanklistRow], result['rows']),
         )
 
+    @staticmethod
+    def iter_standings(*, contest_id: int,
+                       from_: int = None,
+                       count: int = None,
+                       handles: Iterable[str] = None,
+                       room: int = None,
+                       show_unofficial: bool = None) -> Iterator[RanklistRow]:
+        params = {'contestId': contest_id}
+        if from_ is not None:
+            params['from'] = from_
+        if count is not None:
+            params['count'] = count
+        if handles is not None:
+            params['handles'] = ';'.join(handles)
+        if room is not None:
+            params['room'] = room
+        if show_unofficial is not None:
+            params['showUnofficial'] = show_unofficial
+        result = _iter_result(method='contest.standings', params=params, path=['rows'])
+        return map(_decoder(RanklistRow), result)
+
     @staticmethod
     def status(*,
             contest_id: int,
@@ -300,6 +612,22 @@ class contest:
         result = send_request(method='contest.status', params=params)
         return from_json(list[Submission], result)
 
+    @staticmethod
+    def iter_status(*,
+            contest_id: int,
+            handle: str = None,
+            from_: int = None,
+            count: int = None) -> Iterator[Submission]:
+        params = {'contestId': contest_id}
+        if handle is not None:
+            params['handle'] = handle
+        if from_ is not None:
+            params['from'] = from_
+        if count is not None:
+            params['count'] = count
+        result = _iter_result(method='contest.status', params=params)
+        return map(_decoder(Submission), result)
+
 
 class problemset:
     @staticmethod
@@ -342,6 +670,14 @@ class user:
         result = send_request(method='user.ratedList', params=params)
         return from_json(list[User], result)
 
+    @staticmethod
+    def iter_rated_list(*, active_only: bool = None) -> Iterator[User]:
+        params = {}
+        if active_only is not None:
+            params['activeOnly'] = active_only
+        result = _iter_result(method='user.ratedList', params=params)
+        return map(_decoder(User), result)
+
     @staticmethod
     def rating(*, handle: str) -> list[RatingChange]:
         result = send_request(method='user.rating', params={'handle': handle})
@@ -356,3 +692,13 @@ class user:
             params['count'] = count
         result = send_request(method='user.status', params=params)
         return from_json(list[Submission], result)
+
+    @staticmethod
+    def iter_status(*, handle: str, from_: int = None, count: int = None) -> Iterator[Submission]:
+        params = {'handle': handle}
+        if from_ is not None:
+            params['from'] = from_
+        if count is not None:
+            params['count'] = count
+        result = _iter_result(method='user.status', params=params)
+        return map(_decoder(Submission), result)
@@ -1,23 +1,156 @@
+import hashlib
+import json
 import logging
-from typing import Optional
+from typing import NamedTuple, Optional
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, InsertOne, MongoClient, ReplaceOne, UpdateMany, UpdateOne
 from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
 from telegram import User
 
 from . import codeforces_api as cf
 from . import constants
+from . import metrics
+from .problem_index import ProblemIndex
+from .sampler import WeightedSampler
+from .search import SearchIndex
 
 logger = logging.getLogger('database')
 
+_problem_projection = {'_id': False, '_hash': False}
+
+LEADERBOARD_SIZE = 20   # problems shown by /top
+_leaderboard_keep = 2 * LEADERBOARD_SIZE  # slack for problems losing votes
+_band_width = 200
+
+
+def _problem_doc(problem: cf.Problem) -> dict:
+    doc = cf.to_json(problem)
+    doc['tags'] = list(problem.tags)
+    doc['_hash'] = hashlib.sha1(json.dumps(doc, sort_keys=True).encode()).hexdigest()
+    doc['_id'] = problem.mention
+    return doc
+
+
+def rating_band(rating: Optional[int]) -> Optional[str]:
+    return None if rating is None else str(rating // _band_width * _band_width)
+
+
+def _leaderboard_keys(problem: cf.Problem) -> list[str]:
+    # a problem is ranked under each of its tags and 'all', in its band and 'all'
+    bands = ['all'] + ([band] if (band := rating_band(problem.rating)) else [])
+    return [f'{tag}|{band}' for tag in ['all', *problem.tags] for band in bands]
+
+
+def _leaderboard_entry(problem: cf.Problem, counts: dict[str, int]) -> dict:
+    like, dislike = counts.get('like', 0), counts.get('dislike', 0)
+    return {'mention': problem.mention, 'html': problem.html,
+            'score': like - dislike, 'like': like, 'dislike': dislike}
+
+
+_leaderboard_order = {'score': -1, 'like': -1}
+
+
+class SyncResult(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+
+
+class FeedCursor(NamedTuple):
+    handle: str
+    last_id: Optional[int]  # None until the first poll of the handle
+    pending: list[int]      # submission ids still in testing
+    interval: float
+    next_poll: float
+
+
+class QueryPlan(NamedTuple):
+    name: str
+    stages: list[str]
+    error: Optional[str] = None  # e.g. the index the query needs is missing
+
+    @property
+    def collscan(self) -> bool:
+        return 'COLLSCAN' in self.stages
+
+
+def _plan_stages(plan: dict) -> list[str]:
+    plan = plan.get('queryPlan', plan)
+    stages = [plan['stage']] if 'stage' in plan else []
+    children = plan.get('inputStages', [])
+    if 'inputStage' in plan:
+        children = [plan['inputStage']]
+    for child in children:
+        stages += _plan_stages(child)
+    return stages
+
 
 class Database:
-    def __init__(self, db_url):
+    def __init__(self, db_url, db_name: str = 'tgcfbot'):
         self.client = MongoClient(db_url)
-        self.users: Collection = self.client.tgcfbot.users
-        self.problems: Collection = self.client.tgcfbot.problems
-        self.scores: Collection = self.client.tgcfbot.scores
+        database = self.client[db_name]
+        self.users: Collection = database.users
+        self.problems: Collection = database.problems
+        self.scores: Collection = database.scores
+        self.solved: Collection = database.solved
+        self.statistics: Collection = database.statistics
+        self.feeds: Collection = database.feeds
+        self.subscribers: Collection = database.subscribers
+        self.leaderboard: Collection = database.leaderboard
+        self.index: Optional[ProblemIndex] = None
+        self.search: Optional[SearchIndex] = None
+        self.sampler: Optional[WeightedSampler] = None
+
+    def ensure_indexes(self) -> None:
+        # every index serves a query listed in explain_queries; problems are
+        # searched and sampled in memory, their old indexes only slow down syncs
+        indexes = [
+            (self.users, [('tg_user.id', ASCENDING)], {'unique': True}),
+            (self.users, [('cf_user.handle', ASCENDING)], {}),
+            (self.feeds, [('next_poll', ASCENDING)], {}),
+        ]
+        for collection, keys, options in indexes:
+            try:
+                name = collection.create_index(keys, **options)
+                logger.info('index %s.%s is ready', collection.name, name)
+            except OperationFailure as err:
+                logger.error('cannot create index on %s: %s', collection.name, err)
+        for name in ['rating_1_tags_1', 'name_text']:
+            try:
+                if name in self.problems.index_information():
+                    self.problems.drop_index(name)
+                    logger.info('stale index problems.%s dropped', name)
+            except OperationFailure as err:
+                logger.error('cannot drop index problems.%s: %s', name, err)
 
+    def explain_queries(self) -> list[QueryPlan]:
+        queries = {
+            'get_cf_user': lambda: self.users.find({'tg_user.id': 0}),
+            'update_cf_users': lambda: self.users.find({'cf_user.handle': ''}),
+            'due_feeds': lambda: self.feeds.find(
+                {'next_poll': {'$lte': 0}}, {'_id': False}).sort('next_poll', ASCENDING).limit(1),
+            'get_solved': lambda: self.solved.find({'_id': ''}),
+            'get_scores': lambda: self.scores.find({'_id': ''}, {'_id': False, 'counts': True}),
+            'get_scores_many': lambda: self.scores.find({'_id': {'$in': ['', '']}}, {'counts': True}),
+            'get_voters': lambda: self.scores.find(
+                {'_id': ''}, {title: True for title in constants.emojis}),
+            'update_leaderboard': lambda: self.problems.find(
+                {'_id': {'$in': ['', '']}}, _problem_projection),
+            'get_leaderboard': lambda: self.leaderboard.find(
+                {'_id': 'all|all'}, {'entries': {'$slice': 1}}),
+        }
+        plans = []
+        for name, query in queries.items():
+            try:
+                explain = query().explain()
+            except OperationFailure as err:
+                plans.append(QueryPlan(name, [], str(err)))
+                continue
+            plans.append(QueryPlan(name, _plan_stages(explain['queryPlanner']['winningPlan'])))
+        return plans
+
+    @metrics.timer('database')
     def register_user(self, tg_user: User, cf_user: cf.User) -> None:
         self.users.update_one(
             filter={"tg_user.id": tg_user.id},
@@ -28,48 +161,181 @@ class Database:
             upsert=True
         )
 
+    @metrics.timer('database')
     def get_cf_user(self, tg_id: int) -> Optional[cf.User]:
         document = self.users.find_one({"tg_user.id": tg_id})
         return document and cf.from_json(cf.User, document['cf_user'])
 
-    def insert_problems(self, problems: list[cf.Problem], forced: bool = False) -> int:
-        def _get_doc(problem: cf.Problem):
-            doc = cf.to_json(problem)
-            doc['_id'] = problem.mention
-            return doc
-
-        if forced:
-            if self.problems.count_documents({}) > len(problems):
-                logger.critical("danger of dropping problem collection")
-                return 0
-            logger.warning("droping problem collection")
-            self.problems.delete_many(filter={})
-
-        query = {
-            'filter': {'_id': {'$in': [p.mention for p in problems]}},
-            'projection': {'_id': True}
-        }
-        already_problems = set(doc['_id'] for doc in self.problems.find(**query))
-        already_scores = set(doc['_id'] for doc in self.scores.find(**query))
+    @metrics.timer('database')
+    def get_handles(self) -> list[str]:
+        return self.users.distinct('cf_user.handle')
 
-        new_problems = [p for p in problems if p.mention not in already_problems]
-        new_scores = [p for p in problems if p.mention not in already_scores]
+    @metrics.timer('database')
+    def update_cf_users(self, users: dict[str, cf.User]) -> int:
+        # keys are the stored handles, which differ from user.handle after a rename
+        ops = [
+            UpdateMany({'cf_user.handle': handle}, {'$set': {'cf_user': cf.to_json(user)}})
+            for handle, user in users.items()
+        ]
+        if not ops:
+            return 0
+        return self.users.bulk_write(ops, ordered=False).modified_count
 
-        if new_problems:
-            self.problems.insert_many(
-                documents=[_get_doc(p) for p in new_problems],
-                ordered=False
-            )
-        if new_scores:
+    @metrics.timer('database')
+    def remove_handles(self, handles: list[str]) -> int:
+        return self.users.delete_many({'cf_user.handle': {'$in': handles}}).deleted_count
+
+    @metrics.timer('database')
+    def subscribe(self, chat_id: int) -> bool:
+        result = self.subscribers.update_one(
+            filter={'_id': chat_id},
+            update={'$setOnInsert': {'chat_id': chat_id}},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    @metrics.timer('database')
+    def unsubscribe(self, chat_id: int) -> bool:
+        return self.subscribers.delete_one({'_id': chat_id}).deleted_count > 0
+
+    @metrics.timer('database')
+    def get_subscribers(self) -> list[int]:
+        return [doc['_id'] for doc in self.subscribers.find({}, {'_id': True})]
+
+    @metrics.timer('database')
+    def sync_feeds(self, handles: list[str]) -> None:
+        # new handles are polled right away, unregistered ones are dropped
+        known = set(self.feeds.distinct('_id'))
+        ops = [
+            InsertOne(FeedCursor(handle, None, [], 0, 0)._asdict() | {'_id': handle})
+            for handle in set(handles) - known
+        ]
+        if ops:
+            self.feeds.bulk_write(ops, ordered=False)
+        if known - set(handles):
+            self.feeds.delete_many({'_id': {'$in': list(known - set(handles))}})
+
+    @metrics.timer('database')
+    def due_feeds(self, now: float, limit: int) -> list[FeedCursor]:
+        docs = self.feeds.find({'next_poll': {'$lte': now}}, {'_id': False})
+        return [FeedCursor(**doc) for doc in docs.sort('next_poll', ASCENDING).limit(limit)]
+
+    @metrics.timer('database')
+    def update_feeds(self, cursors: list[FeedCursor]) -> None:
+        ops = [
+            UpdateOne({'_id': cursor.handle}, {'$set': cursor._asdict()})
+            for cursor in cursors
+        ]
+        if ops:
+            self.feeds.bulk_write(ops, ordered=False)
+
+    @metrics.timer('database')
+    def get_solved(self, handle: str) -> tuple[int, list[str]]:
+        doc = self.solved.find_one({'_id': handle})
+        if doc is None:
+            return 0, []
+        return doc['last_id'], doc['problems']
+
+    @metrics.timer('database')
+    def add_solved(self, handle: str, last_id: int, mentions: list[str]) -> None:
+        self.solved.update_one(
+            filter={'_id': handle},
+            update={
+                '$set': {'last_id': last_id},
+                '$addToSet': {'problems': {'$each': mentions}}
+            },
+            upsert=True
+        )
+
+    @metrics.timer('database')
+    def sync_problems(self, problems: list[cf.Problem]) -> SyncResult:
+        stored = {doc['_id']: doc for doc in self.problems.find(filter={})}
+        requests = []
+        inserted = []
+        updated = []
+        unchanged = 0
+
+        for problem in problems:
+            doc = _problem_doc(problem)
+            old = stored.get(doc['_id'])
+            if old is None:
+                requests.append(InsertOne(doc))
+                inserted.append(problem)
+            elif old.get('_hash') == doc['_hash']:
+                unchanged += 1
+            else:
+                update = {'$set': {k: v for k, v in doc.items() if old.get(k) != v}}
+                if removed := {k: '' for k in old if k not in doc}:
+                    update['$unset'] = removed
+                requests.append(UpdateOne({'_id': doc['_id']}, update))
+                updated.append(problem)
+
+        if requests:
+            self.problems.bulk_write(requests, ordered=False)
+        if inserted:
             init_score = {title: [] for title in constants.emojis}
-            self.scores.insert_many(
-                documents=[{'_id': p.mention, **init_score} for p in new_scores],
-                ordered=False
-            )
+            init_score['counts'] = {title: 0 for title in constants.emojis}
+            self.scores.bulk_write([
+                UpdateOne({'_id': p.mention}, {'$setOnInsert': init_score}, upsert=True)
+                for p in inserted
+            ], ordered=False)
 
-        logger.info('%d new problems, %d new scores', len(new_problems), len(new_scores))
-        return len(new_problems)
+        result = SyncResult(
+            inserted=len(inserted),
+            updated=len(updated),
+            unchanged=unchanged
+        )
+        logger.info('problems synced: %s', result)
+        if updated:
+            self.refresh_leaderboard([p.mention for p in updated])
+        if requests and self.search is not None:
+            # an index not loaded yet reads everything on its first use
+            changed = inserted + updated
+            self.search.add(changed)
+            self.index.build(self.search.problems())
+            self.sampler.update_problems(changed)
+        return result
 
+    @metrics.timer('database')
+    def sync_statistics(self, statistics: list[cf.ProblemStatistics]) -> int:
+        stored = {
+            doc['_id']: doc['solvedCount']
+            for doc in self.statistics.find(filter={}, projection={'solvedCount': True})
+        }
+        changed = {
+            f'{s.contestId}{s.index}': s.solvedCount
+            for s in statistics
+            if stored.get(f'{s.contestId}{s.index}') != s.solvedCount
+        }
+        if changed:
+            self.statistics.bulk_write([
+                UpdateOne({'_id': mention}, {'$set': {'solvedCount': count}}, upsert=True)
+                for mention, count in changed.items()
+            ], ordered=False)
+            if self.sampler is not None:
+                self.sampler.update_solved_counts(changed)
+        logger.info('%d problem statistics changed', len(changed))
+        return len(changed)
+
+    @metrics.timer('database')
+    def reload_index(self) -> None:
+        docs = self.problems.find(filter={}, projection=_problem_projection)
+        problems = [cf.from_json(cf.Problem, doc) for doc in docs]
+        solved_counts = {
+            doc['_id']: doc['solvedCount']
+            for doc in self.statistics.find(filter={}, projection={'solvedCount': True})
+        }
+        votes = {
+            doc['_id']: doc['counts']
+            for doc in self.scores.find(filter={}, projection={'counts': True})
+            if 'counts' in doc
+        }
+        self.index = ProblemIndex(problems)
+        self.search = SearchIndex(problems)
+        self.sampler = WeightedSampler(problems, solved_counts, votes)
+        logger.info('problem index loaded with %d problems', len(self.search))
+
+    @metrics.timer('database')
     def sample_problem(
             self,
             tags: list[str] = None,
@@ -78,69 +344,159 @@ class Database:
             max_rating: int = 9999
         ) -> Optional[cf.Problem]:
 
-        _filter = {}
-        if tags:
-            _filter['tags'] = {'$all': tags}
-        if exclude:
-            _filter['_id'] = {'$nin': exclude}
-        _filter['rating'] = {
-            '$exists': True,
-            '$gte': min_rating,
-            '$lte': max_rating
-        }
-
-        doc, = list(self.problems.aggregate([
-            {'$match': _filter},
-            {'$project': {'_id': False}},
-            {'$sample': {'size': 1}}
-        ]))
-        return cf.from_json(cf.Problem, doc)
+        if self.index is None:
+            self.reload_index()
+        # weighted draws reject filtered out problems, rare matches fall back to the index
+        problem = self.sampler.sample(
+            tags=tags,
+            exclude=set(exclude or ()),
+            min_rating=min_rating,
+            max_rating=max_rating
+        )
+        return problem or self.index.sample(
+            tags=tags,
+            exclude=exclude,
+            min_rating=min_rating,
+            max_rating=max_rating
+        )
 
+    @metrics.timer('database')
     def query_problem(self, query: str, max_count: int = 10) -> list[cf.Problem]:
-        docs = self.problems.aggregate([
-            {'$match': {'$or': [
-                {'_id': query},
-                {'$text': {'$search': str(query)}}
-            ]}},
-            {'$sort': {
-                'score': {'$meta': 'textScore'}
-            }},
-            {'$project': {'_id': False}},
-            {'$limit': max_count}
-        ])
-        return [cf.from_json(cf.Problem, p) for p in docs]
+        if self.search is None:
+            self.reload_index()
+        return self.search.search(query, max_count=max_count)
 
-    def get_problem(self, mention: str) -> Optional[cf.Problem]:
-        doc = self.problems.find_one(
+    @metrics.timer('database')
+    def get_scores(self, mention: str) -> dict[str, int]:
+        doc = self.scores.find_one(
             filter={'_id': mention},
-            projection={'_id': False}
+            projection={'_id': False, 'counts': True}
         )
-        return doc and cf.from_json(cf.Problem, doc)
+        counts = doc.get('counts', {}) if doc else {}
+        return {title: counts.get(title, 0) for title in constants.emojis}
 
-    def get_scores(self, mention: str) -> dict[str, int]:
-        docs = list(self.scores.aggregate([
-            {'$match': {'_id': mention}},
-            {'$set': {title: {'$size': f'${title}'} for title in constants.emojis}},
-            {'$project': {'_id': False}}
-        ]))
-        if not docs:
-            return {title: 0 for title in constants.emojis}
-        return docs[0]
-
-    def toggle_score(self, mention: str, title: str, tg_id: int) -> bool:
-        if self.get_problem(mention) is None:
-            raise ValueError(f'no such {mention} problem')
-        if self.scores.find_one(filter={'_id': mention, title: tg_id}):
-            self.scores.update_one(
-                filter={'_id': mention},
-                update={'$pull': {title: tg_id}}
+    @metrics.timer('database')
+    def get_scores_many(self, mentions: list[str]) -> dict[str, dict[str, int]]:
+        if not mentions:
+            return {}
+        docs = self.scores.find(
+            filter={'_id': {'$in': list(mentions)}},
+            projection={'counts': True}
+        )
+        counts = {doc['_id']: doc.get('counts', {}) for doc in docs}
+        return {
+            mention: {title: counts.get(mention, {}).get(title, 0) for title in constants.emojis}
+            for mention in mentions
+        }
+
+    @metrics.timer('database')
+    def update_leaderboard(self, scores: dict[str, dict[str, int]]) -> None:
+        # move each problem to its new place: pull the old entry, then push
+        # the new one keeping the list sorted and bounded; problems scored
+        # zero or below leave the lists
+        docs = self.problems.find({'_id': {'$in': list(scores)}}, _problem_projection)
+        ops = []
+        for problem in cf.from_json(list[cf.Problem], list(docs)):
+            entry = _leaderboard_entry(problem, scores[problem.mention])
+            for key in _leaderboard_keys(problem):
+                ops.append(UpdateOne({'_id': key}, {'$pull': {'entries': {'mention': problem.mention}}}))
+                if entry['score'] > 0:
+                    ops.append(UpdateOne({'_id': key}, {'$push': {'entries': {
+                        '$each': [entry], '$sort': _leaderboard_order, '$slice': _leaderboard_keep
+                    }}}, upsert=True))
+        if ops:
+            self.leaderboard.bulk_write(ops, ordered=True)
+
+    @metrics.timer('database')
+    def refresh_leaderboard(self, mentions: list[str]) -> None:
+        # entries copy the problem, after a rename or a new rating or tags
+        # they are pulled from every list and pushed under the new keys
+        scores = {m: c for m, c in self.get_scores_many(mentions).items() if c['like'] > c['dislike']}
+        if not scores:
+            return
+        self.leaderboard.update_many(
+            {'entries.mention': {'$in': list(scores)}},
+            {'$pull': {'entries': {'mention': {'$in': list(scores)}}}}
+        )
+        self.update_leaderboard(scores)
+
+    @metrics.timer('database')
+    def rebuild_leaderboard(self) -> int:
+        scores = {
+            doc['_id']: doc['counts'] for doc in self.scores.find(
+                filter={'counts.like': {'$gt': 0}},
+                projection={'counts': True}
             )
-            return False
-        self.scores.update_one(
-            filter={'_id': mention},
-            update={'$push': {title: tg_id}}
+        }
+        boards: dict[str, list[dict]] = {}
+        for doc in self.problems.find({'_id': {'$in': list(scores)}}, _problem_projection):
+            problem = cf.from_json(cf.Problem, doc)
+            entry = _leaderboard_entry(problem, scores[problem.mention])
+            if entry['score'] <= 0:
+                continue
+            for key in _leaderboard_keys(problem):
+                boards.setdefault(key, []).append(entry)
+        ops = [
+            ReplaceOne({'_id': key}, {'entries': sorted(
+                entries, key=lambda e: (-e['score'], -e['like'])
+            )[:_leaderboard_keep]}, upsert=True)
+            for key, entries in boards.items()
+        ]
+        if ops:
+            self.leaderboard.bulk_write(ops, ordered=False)
+        self.leaderboard.delete_many({'_id': {'$nin': list(boards)}})
+        logger.info('leaderboard rebuilt with %d lists', len(boards))
+        return len(boards)
+
+    @metrics.timer('database')
+    def get_leaderboard(self, tag: str = 'all', band: str = 'all',
+                        count: int = LEADERBOARD_SIZE) -> list[dict]:
+        doc = self.leaderboard.find_one({'_id': f'{tag}|{band}'}, {'entries': {'$slice': count}})
+        return doc['entries'] if doc else []
+
+    @metrics.timer('database')
+    def get_voters(self, mention: str) -> Optional[dict[str, list[int]]]:
+        doc = self.scores.find_one({'_id': mention}, {title: True for title in constants.emojis})
+        return doc and {title: doc.get(title, []) for title in constants.emojis}
+
+    @metrics.timer('database')
+    def apply_votes(self, votes: dict[str, dict[str, dict[int, bool]]]) -> None:
+        # votes maps mention -> title -> voter -> voted; each update sets the
+        # final state of the voters it touches, so replaying it is harmless
+        ops = []
+        for mention, titles in votes.items():
+            voters, counts = {}, {}
+            for title, changes in titles.items():
+                touched = list(changes)
+                kept = {'$filter': {
+                    'input': {'$ifNull': [f'${title}', []]},
+                    'cond': {'$not': {'$in': ['$$this', touched]}}
+                }}
+                voters[title] = {'$concatArrays': [kept, [v for v in touched if changes[v]]]}
+                counts[f'counts.{title}'] = {'$size': f'${title}'}
+            ops.append(UpdateOne({'_id': mention}, [{'$set': voters}, {'$set': counts}]))
+        if not ops:
+            return
+        self.scores.bulk_write(ops, ordered=False)
+        voted = [m for m, titles in votes.items() if {'like', 'dislike'} & titles.keys()]
+        if voted:
+            scores = self.get_scores_many(voted)
+            self.update_leaderboard(scores)
+            if self.sampler is not None:
+                for mention, counts in scores.items():
+                    self.sampler.update_votes(mention, counts)
+
+    def migrate_scores(self) -> int:
+        # score documents used to keep only voter arrays, add their counters
+        result = self.scores.update_many(
+            filter={'counts': {'$exists': False}},
+            update=[{'$set': {'counts': {
+                title: {'$size': {'$ifNull': [f'${title}', []]}}
+                for title in constants.emojis
+            }}}]
         )
-        return True
+        logger.info('%d score documents migrated', result.modified_count)
+        return result.modified_count
 
     def close(self):
         self.client.close()
@@ -0,0 +1,82 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+from urllib.parse import urlencode
+
+logger = logging.getLogger('disk_cache')
+
+# seconds a response stays fresh, methods not listed are never cached
+DEFAULT_TTLS = {
+    'problemset.problems': 3600,
+    'contest.list': 3600,
+    'contest.ratingChanges': 86400,
+    'user.info': 300,
+    'user.rating': 3600,
+}
+
+
+class ResponseCache:
+    # expired entries are still served for `stale` seconds while a fresh
+    # copy is fetched in the background
+
+    def __init__(self, path: str,
+                 ttls: dict[str, float] = None,
+                 stale: float = 86400,
+                 max_entries: int = 1000,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.stale = stale
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, stored REAL NOT NULL, accessed REAL NOT NULL, body TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+    @staticmethod
+    def key(method: str, params: dict) -> str:
+        return f'{method}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}'
+
+    def cacheable(self, method: str) -> bool:
+        return method in self.ttls
+
+    def get(self, method: str, params: dict) -> Optional[tuple[Any, bool]]:
+        """cached result and whether it is still fresh, None when missing or too old"""
+        key = self.key(method, params)
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT stored, body FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            age = now - row[0]
+            if age > self.ttls[method] + self.stale:
+                return None
+            self._conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+        return json.loads(row[1]), age <= self.ttls[method]
+
+    def put(self, method: str, params: dict, result: Any) -> None:
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, stored, accessed, body) VALUES (?, ?, ?, ?)',
+                (self.key(method, params), now, now, json.dumps(result))
+            )
+            # least recently read entries go first
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN ('
+                'SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
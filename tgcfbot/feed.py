@@ -0,0 +1,84 @@
+import logging
+import time
+from typing import Callable, NamedTuple
+
+from . import codeforces_api as cf
+from .database import Database, FeedCursor
+from .util import valid_problems
+
+logger = logging.getLogger('feed')
+
+
+class Solve(NamedTuple):
+    handle: str
+    problem: cf.Problem
+    submission_id: int
+
+    @property
+    def html(self) -> str:
+        return f'<b>{self.handle}</b> solved {self.problem.html}'
+
+
+def advance(cursor: FeedCursor, submissions: list[cf.Submission], now: float,
+            min_interval: float, max_interval: float) -> tuple[FeedCursor, list[Solve]]:
+    # submissions are the newest ones of the handle, newest first
+    if cursor.last_id is None:
+        fresh, solves = submissions, []
+    else:
+        pending = set(cursor.pending)
+        fresh = [s for s in submissions if s.id > cursor.last_id or s.id in pending]
+        seen, solves = set(), []
+        for submission in reversed(fresh):
+            mention = submission.problem.mention
+            if submission.verdict == cf.Verdict.OK and mention not in seen \
+                    and valid_problems([submission.problem]):
+                seen.add(mention)
+                solves.append(Solve(cursor.handle, submission.problem, submission.id))
+
+    last_id = max([cursor.last_id or 0] + [s.id for s in fresh])
+    if cursor.last_id is not None and last_id > cursor.last_id:
+        interval = min_interval
+    else:
+        interval = min(max(2 * cursor.interval, min_interval), max_interval)
+    return FeedCursor(
+        handle=cursor.handle,
+        last_id=last_id,
+        pending=[s.id for s in fresh if s.testing],
+        interval=interval,
+        next_poll=now + interval
+    ), solves
+
+
+class SubmissionFeed:
+    # each poll spends at most `budget` user.status calls on the handles that
+    # are due; active handles are polled every min_interval, idle ones back off
+    # exponentially up to max_interval
+
+    def __init__(self, database: Database, budget: int, count: int = 10,
+                 min_interval: float = 60, max_interval: float = 3600,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.database = database
+        self.budget = budget
+        self.count = count
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.clock = clock
+
+    def poll(self) -> list[Solve]:
+        self.database.sync_feeds(self.database.get_handles())
+        now = self.clock()
+        cursors, solves = [], []
+        for cursor in self.database.due_feeds(now, self.budget):
+            try:
+                submissions = cf.user.status(handle=cursor.handle, from_=1, count=self.count)
+            except Exception as err:  # pylint: disable=broad-except
+                # one bad handle must not lose the cursors of the others
+                logger.warning('feed of %s failed: %s', cursor.handle, err)
+                interval = min(max(2 * cursor.interval, self.min_interval), self.max_interval)
+                cursors.append(cursor._replace(interval=interval, next_poll=now + interval))
+                continue
+            cursor, new = advance(cursor, submissions, now, self.min_interval, self.max_interval)
+            cursors.append(cursor)
+            solves += new
+        self.database.update_feeds(cursors)
+        return solves
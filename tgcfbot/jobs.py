@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from . import codeforces_api as cf
+from .database import Database
+
+logger = logging.getLogger('jobs')
+
+_not_found = re.compile(r'User with handle (\S+) not found')
+
+
+class RunStatus(NamedTuple):
+    started: float
+    duration: float
+    status: str
+
+
+class ProblemsetRefresher:
+    def __init__(self, database: Database, on_change: Callable[[], None] = None) -> None:
+        self.database = database
+        self.on_change = on_change
+        self.digest: Optional[str] = None
+        self.last_run: Optional[RunStatus] = None
+        self._lock = threading.Lock()
+
+    def run(self, force: bool = False) -> str:
+        if not self._lock.acquire(blocking=False):
+            return 'already running'
+        started = time.time()
+        try:
+            # after a restart a fresh cached problemset saves the largest download
+            result = cf.send_request(
+                method='problemset.problems',
+                params={},
+                use_cache=self.digest is None and not force,
+                allow_stale=False
+            )
+            # solved counts change all the time, only the problems are hashed
+            digest = hashlib.sha1(json.dumps(result['problems'], sort_keys=True).encode()).hexdigest()
+            if digest == self.digest and not force:
+                status = 'problems unchanged'
+            else:
+                problems = cf.from_json(list[cf.Problem], result['problems'])
+                sync = self.database.sync_problems(problems)
+                self.digest = digest
+                status = f'{sync.inserted} new, {sync.updated} updated, {sync.unchanged} unchanged'
+                if (sync.inserted or sync.updated) and self.on_change:
+                    self.on_change()
+            statistics = cf.from_json(list[cf.ProblemStatistics], result['problemStatistics'])
+            status += f', {self.database.sync_statistics(statistics)} statistics changed'
+        except Exception as err:  # pylint: disable=broad-except
+            logger.exception('problemset refresh failed')
+            status = f'failed: {err}'
+        finally:
+            self.last_run = RunStatus(started, time.time() - started, status)
+            self._lock.release()
+        logger.info('problemset refresh: %s', status)
+        return status
+
+
+class ProfileRefresher:
+    # user.info takes many handles per call, so a refresh costs one call per
+    # batch; unknown handles are dropped from the batch and unregistered
+    def __init__(self, database: Database, batch_size: int = 300) -> None:
+        self.database = database
+        self.batch_size = batch_size
+        self.last_run: Optional[RunStatus] = None
+        self._lock = threading.Lock()
+
+    def fetch(self, handles: list[str]) -> tuple[dict[str, cf.User], list[str]]:
+        handles, invalid = list(handles), []
+        while handles:
+            try:
+                result = cf.send_request(
+                    method='user.info',
+                    params={'handles': ';'.join(handles)},
+                    use_cache=False
+                )
+            except cf.APIError as err:
+                match = _not_found.search(str(err))
+                if match is None:
+                    raise
+                missing = match.group(1).lower()
+                invalid += [h for h in handles if h.lower() == missing]
+                handles = [h for h in handles if h.lower() != missing]
+                continue
+            # results come in the order of the requested handles
+            return dict(zip(handles, cf.from_json(list[cf.User], result))), invalid
+        return {}, invalid
+
+    def run(self) -> str:
+        if not self._lock.acquire(blocking=False):
+            return 'already running'
+        started = time.time()
+        try:
+            handles = self.database.get_handles()
+            updated, renamed, removed = 0, 0, []
+            for i in range(0, len(handles), self.batch_size):
+                users, invalid = self.fetch(handles[i:i + self.batch_size])
+                updated += self.database.update_cf_users(users)
+                renamed += sum(handle != user.handle for handle, user in users.items())
+                removed += invalid
+            if removed:
+                self.database.remove_handles(removed)
+                logger.info('unregistered handles %s', ', '.join(removed))
+            status = f'{len(handles)} handles, {updated} updated, {renamed} renamed, {len(removed)} removed'
+        except Exception as err:  # pylint: disable=broad-except
+            logger.exception('profile refresh failed')
+            status = f'failed: {err}'
+        finally:
+            self.last_run = RunStatus(started, time.time() - started, status)
+            self._lock.release()
+        logger.info('profile refresh: %s', status)
+        return status
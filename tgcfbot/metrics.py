@@ -0,0 +1,138 @@
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+
+# upper bounds of latency buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += seconds
+            self.count += 1
+            self.errors += error
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket holding the quantile
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, kind: str, name: str) -> Histogram:
+        key = (kind, name)
+        if (histogram := self._histograms.get(key)) is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    @contextlib.contextmanager
+    def timed(self, kind: str, name: str) -> Iterator[None]:
+        histogram = self.histogram(kind, name)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            histogram.observe(time.perf_counter() - start, error=True)
+            raise
+        histogram.observe(time.perf_counter() - start)
+
+    def timer(self, kind: str, name: str = None) -> Callable[[Callable], Callable]:
+        def wrapper(func: Callable) -> Callable:
+            histogram = self.histogram(kind, name or func.__name__)
+
+            @functools.wraps(func)
+            def timed_func(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    histogram.observe(time.perf_counter() - start, error=True)
+                    raise
+                histogram.observe(time.perf_counter() - start)
+                return result
+
+            return timed_func
+
+        return wrapper
+
+    def items(self) -> list[tuple[tuple[str, str], Histogram]]:
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def summary(self, kind: str = None) -> list[str]:
+        return [
+            f'{kind_} {name}: {h.count} calls, {h.errors} errors, '
+            f'avg {h.total / h.count * 1000:.1f}ms, p50 <{h.quantile(0.5) * 1000:g}ms, '
+            f'p99 <{h.quantile(0.99) * 1000:g}ms'
+            for (kind_, name), h in self.items() if h.count and kind in (None, kind_)
+        ]
+
+    def prometheus(self) -> str:
+        lines = [
+            '# TYPE tgcfbot_latency_seconds histogram',
+            '# TYPE tgcfbot_errors_total counter',
+        ]
+        for (kind, name), h in self.items():
+            labels = f'kind="{kind}",name="{name}"'
+            seen = 0
+            for bound, count in zip(h.buckets, h.counts):
+                seen += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'tgcfbot_latency_seconds_bucket{{{labels},le="{le}"}} {seen}')
+            lines.append(f'tgcfbot_latency_seconds_sum{{{labels}}} {h.total}')
+            lines.append(f'tgcfbot_latency_seconds_count{{{labels}}} {h.count}')
+            lines.append(f'tgcfbot_errors_total{{{labels}}} {h.errors}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+timed = registry.timed
+timer = registry.timer
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+def serve_prometheus(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _PrometheusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,226 @@
+import functools
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, NamedTuple
+
+from telegram.error import RetryAfter
+
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger('outbox')
+
+INTERACTIVE = 0  # replies to a user action
+BROADCAST = 1    # job driven messages and edits
+
+
+class _Job(NamedTuple):
+    seq: int
+    chat_id: Hashable
+    func: Callable[[], Any]
+    future: Future
+    attempt: int = 0
+    not_before: float = 0
+
+
+# a lane is a FIFO of one chat and priority; debounced jobs get a lane of
+# their own key so that their delay does not hold back the chat
+_Lane = tuple[Hashable, int, Hashable]
+
+
+class Outbox:
+    # telegram allows about 30 messages a second overall, one a second in a
+    # private chat and 20 a minute in a group. lanes whose head may be sent
+    # wait in a heap by (priority, seq), the others in a heap by the time they
+    # may be sent; a lane has one job in flight at a time, so jobs of a chat
+    # keep their order while a few workers send to different chats at once
+
+    def __init__(self, global_rate: float = 30, private_rate: float = 1,
+                 group_rate: float = 20 / 60, burst: float = 3, max_retries: int = 3,
+                 workers: int = 4, clock: Callable[[], float] = time.monotonic) -> None:
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self._global = TokenBucket(global_rate, capacity=global_rate, clock=clock)
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        self._paused: dict[Hashable, float] = {}
+        self._latest: dict[Hashable, tuple[Callable[[], Any], Future]] = {}
+        self._lanes: dict[_Lane, deque[_Job]] = {}
+        self._busy: set[_Lane] = set()
+        self._ready: list[tuple[int, int, _Lane]] = []
+        self._waiting: list[tuple[float, int, _Lane]] = []
+        self._pending = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f'outbox-{i}', daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def submit(self, chat_id: Hashable, func: Callable[[], Any], priority: int = INTERACTIVE) -> Future:
+        # chat_id keys the per chat limit, inline messages use their own id
+        future = Future()
+        with self._cond:
+            self._push((chat_id, priority, None), _Job(next(self._seq), chat_id, func, future))
+        return future
+
+    def submit_latest(self, key: Hashable, chat_id: Hashable, func: Callable[[], Any],
+                      delay: float = 0, priority: int = INTERACTIVE) -> Future:
+        # jobs sharing a key within `delay` collapse into the last one, e.g.
+        # edits of the same message; all of their futures get its result
+        with self._cond:
+            if key in self._latest:
+                _, future = self._latest[key]
+                self._latest[key] = func, future
+                return future
+            future = Future()
+            self._latest[key] = func, future
+            job = _Job(next(self._seq), chat_id, functools.partial(self._call_latest, key),
+                       Future(), not_before=self.clock() + delay)
+            job.future.add_done_callback(functools.partial(self._resolve_latest, future))
+            self._push((chat_id, priority, key), job)
+        return future
+
+    def _call_latest(self, key: Hashable) -> Any:
+        with self._cond:
+            if key not in self._latest:
+                return None  # sent by a retried job of the same key
+            func, future = self._latest.pop(key)
+        try:
+            return func()
+        except RetryAfter:
+            with self._cond:
+                self._latest.setdefault(key, (func, future))
+            raise
+
+    @staticmethod
+    def _resolve_latest(future: Future, done: Future) -> None:
+        if (err := done.exception()) is not None:
+            future.set_exception(err)
+        else:
+            future.set_result(done.result())
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._pending
+
+    def _bucket(self, chat_id: Hashable) -> TokenBucket:
+        if (bucket := self._buckets.get(chat_id)) is None:
+            if len(self._buckets) >= 10000:
+                # idle buckets are full again, dropping them changes nothing
+                self._buckets = {k: b for k, b in self._buckets.items() if b.delay() > 0}
+            group = isinstance(chat_id, int) and chat_id < 0
+            rate = self.group_rate if group else self.private_rate
+            bucket = self._buckets[chat_id] = TokenBucket(rate, capacity=self.burst, clock=self.clock)
+        return bucket
+
+    # the methods below run with self._cond held
+
+    def _push(self, lane: _Lane, job: _Job, front: bool = False) -> None:
+        self._pending += 1
+        if (jobs := self._lanes.get(lane)) is None:
+            jobs = self._lanes[lane] = deque()
+        if front:
+            jobs.appendleft(job)
+        else:
+            jobs.append(job)
+        if len(jobs) == 1 and lane not in self._busy:
+            heapq.heappush(self._ready, (lane[1], job.seq, lane))
+        self._cond.notify()
+
+    def _release(self, lane: _Lane) -> None:
+        # the job in flight of the lane is done, its next one may go
+        self._busy.discard(lane)
+        if jobs := self._lanes.get(lane):
+            heapq.heappush(self._ready, (lane[1], jobs[0].seq, lane))
+            self._cond.notify()
+        else:
+            self._lanes.pop(lane, None)
+
+    def _take(self) -> tuple[Any, float]:
+        # the first job that may be sent in priority order, or how long to wait
+        now = self.clock()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, seq, lane = heapq.heappop(self._waiting)
+            heapq.heappush(self._ready, (lane[1], seq, lane))
+        while self._ready:
+            priority, seq, lane = heapq.heappop(self._ready)
+            job = self._lanes[lane][0]
+            chat_id = job.chat_id
+            delay = max(self._paused.get(chat_id, now), job.not_before) - now
+            if delay <= 0:
+                self._paused.pop(chat_id, None)
+                delay = self._bucket(chat_id).delay()
+            if delay > 0:
+                heapq.heappush(self._waiting, (now + delay, seq, lane))
+                continue
+            if (delay := self._global.delay()) > 0:
+                heapq.heappush(self._ready, (priority, seq, lane))
+                return None, delay
+            self._bucket(chat_id).try_acquire()
+            self._global.try_acquire()
+            self._lanes[lane].popleft()
+            self._pending -= 1
+            self._busy.add(lane)
+            return (lane, job), 0
+        return None, self._waiting[0][0] - now if self._waiting else math.inf
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    taken, wait = self._take()
+                    if taken is not None:
+                        break
+                    self._cond.wait(None if wait == math.inf else wait)
+            self._send(*taken)
+
+    def _send(self, lane: _Lane, job: _Job) -> None:
+        retry = self._deliver(job)
+        with self._cond:
+            if retry is not None:
+                self._push(lane, retry, front=True)
+            self._release(lane)
+
+    def _deliver(self, job: _Job) -> Any:
+        # returns the job to send again after a flood wait
+        if job.attempt == 0 and not job.future.set_running_or_notify_cancel():
+            return None
+        try:
+            result = job.func()
+        except RetryAfter as err:
+            if job.attempt >= self.max_retries:
+                job.future.set_exception(err)
+                return None
+            logger.info('chat %s flooded, retry after %ss', job.chat_id, err.retry_after)
+            with self._cond:
+                self._paused[job.chat_id] = self.clock() + err.retry_after
+            return job._replace(attempt=job.attempt + 1)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warning('sending to %s failed: %s', job.chat_id, err)
+            job.future.set_exception(err)
+        else:
+            job.future.set_result(result)
+        return None
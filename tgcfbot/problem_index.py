@@ -0,0 +1,86 @@
+import bisect
+import random
+from typing import Iterable, Optional
+
+from . import codeforces_api as cf
+
+_POPCOUNT = [bin(i).count('1') for i in range(256)]
+
+
+def _bitset(positions: Iterable[int], size: int) -> int:
+    data = bytearray((size + 7) // 8)
+    for i in positions:
+        data[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(data, 'little')
+
+
+def _nth_bit(mask: int, n: int) -> int:
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        if n < _POPCOUNT[byte]:
+            for bit in range(8):
+                if byte >> bit & 1:
+                    if n == 0:
+                        return index * 8 + bit
+                    n -= 1
+        n -= _POPCOUNT[byte]
+    raise IndexError('not enough bits in mask')
+
+
+class ProblemIndex:
+    # rated problems sorted by rating, a rating window is a contiguous
+    # range of positions and every tag is a bitset over these positions
+
+    def __init__(self, problems: Iterable[cf.Problem] = ()) -> None:
+        self.build(problems)
+
+    def build(self, problems: Iterable[cf.Problem]) -> None:
+        rated = sorted((p for p in problems if p.rating is not None), key=lambda p: p.rating)
+        tag_positions: dict[str, list[int]] = {}
+        for i, problem in enumerate(rated):
+            for tag in problem.tags:
+                tag_positions.setdefault(tag, []).append(i)
+
+        # swap in a single assignment, readers never see a half built index
+        self._state = (
+            rated,
+            [p.rating for p in rated],
+            {p.mention: i for i, p in enumerate(rated)},
+            {tag: _bitset(pos, len(rated)) for tag, pos in tag_positions.items()},
+        )
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def sample(
+            self,
+            tags: list[str] = None,
+            exclude: list[str] = None,
+            min_rating: int = 0,
+            max_rating: int = 9999,
+            rnd: random.Random = random
+        ) -> Optional[cf.Problem]:
+
+        problems, ratings, positions, tag_bits = self._state
+        low = bisect.bisect_left(ratings, min_rating)
+        high = bisect.bisect_right(ratings, max_rating)
+        if low >= high:
+            return None
+
+        mask = (1 << high) - (1 << low)
+        for tag in tags or ():
+            mask &= tag_bits.get(tag, 0)
+        if exclude:
+            excluded = (positions.get(mention) for mention in exclude)
+            mask &= ~_bitset((i for i in excluded if i is not None), len(problems))
+
+        count = bin(mask).count('1')
+        if count == 0:
+            return None
+
+        # dense masks are hit quickly by guessing, sparse ones are walked
+        for _ in range(8):
+            i = rnd.randrange(low, high)
+            if mask >> i & 1:
+                return problems[i]
+        return problems[_nth_bit(mask, rnd.randrange(count))]
@@ -0,0 +1,42 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def delay(self) -> float:
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self) -> float:
+        # reserve the token first so that waiting threads are served in order
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+        if wait:
+            time.sleep(wait)
+        return wait
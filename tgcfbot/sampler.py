@@ -0,0 +1,134 @@
+import bisect
+import itertools
+import math
+import random
+from typing import Iterable, Optional
+
+from . import codeforces_api as cf
+
+
+def problem_weight(solved_count: int, counts: dict[str, int]) -> float:
+    # well solved and liked problems first, disliked ones pushed back
+    return math.log2(2 + solved_count) * (1 + counts.get('like', 0)) / (1 + counts.get('dislike', 0))
+
+
+class AliasTable:
+    # Vose's alias method, O(n) to build and O(1) per draw
+
+    def __init__(self, weights: list[float]) -> None:
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+    def draw(self, rnd: random.Random) -> int:
+        i = rnd.randrange(len(self.prob))
+        return i if rnd.random() < self.prob[i] else self.alias[i]
+
+
+class _Bucket:
+    def __init__(self, problems: list[cf.Problem], weights: list[float]) -> None:
+        self.problems = problems
+        self.weights = weights
+        self.total = sum(weights)
+        self.table = AliasTable(weights)
+
+
+class WeightedSampler:
+    # one alias table per rating, a draw picks a rating by its total weight
+    # then a problem of it, filters are applied by rejection
+
+    def __init__(self,
+                 problems: Iterable[cf.Problem],
+                 solved_counts: dict[str, int],
+                 votes: dict[str, dict[str, int]]) -> None:
+        self.solved_counts = dict(solved_counts)
+        self.votes = dict(votes)
+        self._buckets: dict[int, _Bucket] = {}
+        self._ratings: list[int] = []
+        self._rating_of: dict[str, int] = {}
+        grouped: dict[int, list[cf.Problem]] = {}
+        for problem in problems:
+            if problem.rating is not None:
+                grouped.setdefault(problem.rating, []).append(problem)
+                self._rating_of[problem.mention] = problem.rating
+        for rating, members in grouped.items():
+            self._build(rating, members)
+
+    def _weight(self, mention: str) -> float:
+        return problem_weight(self.solved_counts.get(mention, 0), self.votes.get(mention, {}))
+
+    def _build(self, rating: int, problems: list[cf.Problem]) -> None:
+        weights = [self._weight(p.mention) for p in problems]
+        self._buckets[rating] = _Bucket(problems, weights)
+        if rating not in self._ratings:
+            self._ratings = sorted([*self._ratings, rating])
+
+    def _rebuild(self, ratings: Iterable[int]) -> None:
+        for rating in set(ratings):
+            self._build(rating, self._buckets[rating].problems)
+
+    def _ratings_of(self, mentions: Iterable[str]) -> set[int]:
+        return {self._rating_of[m] for m in mentions if m in self._rating_of}
+
+    def update_votes(self, mention: str, counts: dict[str, int]) -> None:
+        self.votes[mention] = counts
+        self._rebuild(self._ratings_of([mention]))
+
+    def update_solved_counts(self, solved_counts: dict[str, int]) -> None:
+        self.solved_counts.update(solved_counts)
+        self._rebuild(self._ratings_of(solved_counts))
+
+    def update_problems(self, problems: Iterable[cf.Problem]) -> None:
+        # new or changed problems, only the buckets they leave or join are built again
+        changed = {p.mention: p for p in problems}
+        ratings = self._ratings_of(changed)
+        for mention, problem in changed.items():
+            self._rating_of.pop(mention, None)
+            if problem.rating is not None:
+                self._rating_of[mention] = problem.rating
+                ratings.add(problem.rating)
+        for rating in ratings:
+            members = [p for p in self._buckets[rating].problems
+                       if p.mention not in changed] if rating in self._buckets else []
+            members += [p for p in changed.values() if p.rating == rating]
+            if members:
+                self._build(rating, members)
+            else:
+                self._ratings = [r for r in self._ratings if r != rating]
+                del self._buckets[rating]
+
+    def sample(
+            self,
+            tags: list[str] = None,
+            exclude: set[str] = None,
+            min_rating: int = 0,
+            max_rating: int = 9999,
+            rnd: random.Random = random,
+            tries: int = 32
+        ) -> Optional[cf.Problem]:
+
+        low = bisect.bisect_left(self._ratings, min_rating)
+        high = bisect.bisect_right(self._ratings, max_rating)
+        buckets = [self._buckets[r] for r in self._ratings[low:high]]
+        if not buckets:
+            return None
+        cum_weights = list(itertools.accumulate(b.total for b in buckets))
+        tags = set(tags or ())
+        exclude = exclude or set()
+
+        for _ in range(tries):
+            bucket, = rnd.choices(buckets, cum_weights=cum_weights)
+            problem = bucket.problems[bucket.table.draw(rnd)]
+            if problem.mention not in exclude and tags.issubset(problem.tags):
+                return problem
+        return None
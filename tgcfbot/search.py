@@ -0,0 +1,124 @@
+import bisect
+import re
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+from . import codeforces_api as cf
+
+_rating_re = re.compile(r'^r:(\d+)(?:-(\d+))?$')
+
+
+def _trigrams(text: str) -> set[str]:
+    text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class Query:
+    def __init__(self, text: str, known_tags: Iterable[str] = ()) -> None:
+        self.tags: list[str] = []
+        self.min_rating: Optional[int] = None
+        self.max_rating: Optional[int] = None
+        words = []
+        for word in text.lower().split():
+            if word.startswith('tag:') and len(word) > 4:
+                # tag:data_str matches "data structures"
+                prefix = word[4:].replace('_', ' ')
+                self.tags.append([t for t in known_tags if t.startswith(prefix)])
+            elif match := _rating_re.match(word):
+                low, high = match.groups()
+                self.min_rating = int(low)
+                self.max_rating = int(high or low)
+            else:
+                words.append(word)
+        self.text = ' '.join(words)
+
+    def accepts(self, problem: cf.Problem) -> bool:
+        if self.min_rating is not None and not (
+                problem.rating is not None and self.min_rating <= problem.rating <= self.max_rating):
+            return False
+        return all(any(t in problem.tags for t in options) for options in self.tags)
+
+
+class SearchIndex:
+    # mentions are kept sorted for prefix lookups, names are
+    # indexed by trigrams to tolerate partial words and typos
+
+    def __init__(self, problems: Iterable[cf.Problem] = ()) -> None:
+        self._lock = threading.Lock()
+        self._problems: dict[str, cf.Problem] = {}
+        self._mentions: list[str] = []
+        self._names: dict[str, str] = {}
+        self._sizes: dict[str, int] = {}
+        self._trigrams: dict[str, set[str]] = {}
+        self._tags: set[str] = set()
+        self._recent: Optional[list[str]] = None
+        self.add(problems)
+
+    def __len__(self) -> int:
+        return len(self._problems)
+
+    def problems(self) -> list[cf.Problem]:
+        with self._lock:
+            return list(self._problems.values())
+
+    def add(self, problems: Iterable[cf.Problem]) -> None:
+        with self._lock:
+            for problem in problems:
+                key = problem.mention.lower()
+                if key in self._problems:
+                    for gram in _trigrams(self._names[key]):
+                        self._trigrams[gram].discard(key)
+                else:
+                    bisect.insort(self._mentions, key)
+                name = problem.name.lower()
+                grams = _trigrams(name)
+                self._problems[key] = problem
+                self._names[key] = name
+                self._sizes[key] = len(grams)
+                self._tags.update(problem.tags)
+                for gram in grams:
+                    self._trigrams.setdefault(gram, set()).add(key)
+            self._recent = None
+
+    def _by_mention(self, text: str) -> list[str]:
+        start = bisect.bisect_left(self._mentions, text)
+        stop = bisect.bisect_left(self._mentions, text + '\x7f')
+        return self._mentions[start:stop]
+
+    def _by_name(self, text: str) -> dict[str, float]:
+        grams = _trigrams(text)
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._trigrams.get(gram, ()))
+        # at least half of the query trigrams should appear in the name
+        threshold = len(grams) / 2
+        return {
+            key: count / (len(grams) + self._sizes[key] - count)
+            for key, count in hits.items() if count >= threshold
+        }
+
+    def search(self, text: str, max_count: int = 10) -> list[cf.Problem]:
+        with self._lock:
+            query = Query(text, self._tags)
+            if not query.text:
+                if self._recent is None:
+                    self._recent = sorted(self._problems, reverse=True,
+                                          key=lambda k: self._problems[k].contestId or 0)
+                keys = self._recent
+            else:
+                scores = {}
+                for key, similarity in self._by_name(query.text).items():
+                    scores[key] = similarity + (query.text in self._names[key])
+                for key in self._by_mention(query.text.replace(' ', '')):
+                    scores[key] = 3 if key == query.text else 2 - len(key) / 100
+                keys = sorted(scores, key=scores.get, reverse=True)
+
+            result = []
+            for key in keys:
+                problem = self._problems[key]
+                if query.accepts(problem):
+                    result.append(problem)
+                    if len(result) == max_count:
+                        break
+            return result
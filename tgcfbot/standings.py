@@ -0,0 +1,101 @@
+import html
+import logging
+import threading
+from typing import NamedTuple
+
+from . import codeforces_api as cf
+from .cache import TTLCache
+from .database import Database
+
+logger = logging.getLogger('standings')
+
+
+class Standings(NamedTuple):
+    contest: cf.Contest
+    problems: list[cf.Problem]
+    rows: list[cf.RanklistRow]
+
+
+class Edit(NamedTuple):
+    chat_id: int
+    message_id: int
+    text: str
+
+
+def _result_mark(result: cf.ProblemResult) -> str:
+    if result.points > 0:
+        return '+'
+    return '-' if result.rejectedAttemptCount else '.'
+
+
+def render(standings: Standings, max_rows: int = 30) -> str:
+    contest = standings.contest
+    lines = [f'<b>{html.escape(contest.name)}</b> ({contest.phase.lower().replace("_", " ")})']
+    if not standings.rows:
+        lines.append('no registered user in this contest')
+    for row in standings.rows[:max_rows]:
+        party = row.party.teamName or ', '.join(m.handle for m in row.party.members)
+        marks = ''.join(_result_mark(r) for r in row.problemResults)
+        unofficial = '' if row.party.participantType == cf.ParticipantType.CONTESTANT else '*'
+        lines.append(
+            f'{row.rank}. {html.escape(party)}{unofficial} {row.points:g} '
+            f'[{row.penalty}] <code>{marks}</code>'
+        )
+    return '\n'.join(lines)
+
+
+class StandingsTracker:
+    # standings of registered users are fetched at most once per ttl for all
+    # chats, watched messages are edited only when their text changes
+
+    def __init__(self, database: Database, ttl: float = 30, max_rows: int = 30) -> None:
+        self.database = database
+        self.max_rows = max_rows
+        self.cache = TTLCache(maxsize=64, ttl=ttl)
+        self.watchers: dict[int, dict[tuple[int, int], str]] = {}
+        self._fetch_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def fetch(self, contest_id: int) -> Standings:
+        with self._fetch_lock:
+            if (standings := self.cache.get(contest_id)) is None:
+                handles = self.database.get_handles()
+                if handles:
+                    standings = Standings(*cf.contest.standings(
+                        contest_id=contest_id, handles=handles, show_unofficial=True
+                    ))
+                else:
+                    contest, problems, _ = cf.contest.standings(contest_id=contest_id, count=1)
+                    standings = Standings(contest, problems, [])
+                self.cache.set(contest_id, standings)
+            return standings
+
+    def render(self, contest_id: int) -> str:
+        return render(self.fetch(contest_id), max_rows=self.max_rows)
+
+    def watch(self, contest_id: int, chat_id: int, message_id: int, text: str) -> None:
+        with self._lock:
+            self.watchers.setdefault(contest_id, {})[chat_id, message_id] = text
+
+    def poll(self) -> list[Edit]:
+        with self._lock:
+            watched = {contest_id: dict(messages) for contest_id, messages in self.watchers.items()}
+
+        edits = []
+        for contest_id, messages in watched.items():
+            try:
+                standings = self.fetch(contest_id)
+            except cf.APIError:
+                logger.warning('standings of %d failed', contest_id, exc_info=True)
+                continue
+            text = render(standings, max_rows=self.max_rows)
+            finished = standings.contest.phase == cf.ContestPhase.FINISHED
+            with self._lock:
+                current = self.watchers.get(contest_id, {})
+                for key, last_text in messages.items():
+                    if last_text != text:
+                        edits.append(Edit(*key, text))
+                        current[key] = text
+                if finished:
+                    self.watchers.pop(contest_id, None)
+        return edits
@@ -0,0 +1,11 @@
+import pytest
+
+from .. import codeforces_api as cf
+
+
+@pytest.fixture(scope='session', autouse=True)
+def no_retries():
+    # tests against the live api fail fast offline instead of backing off
+    retries, cf.client.retries = cf.client.retries, 0
+    yield
+    cf.client.retries = retries
@@ -0,0 +1,61 @@
+from typing import Optional
+
+from pymongo import DeleteMany, UpdateMany
+
+from .. import codeforces_api as cf
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_problem(contest_id: int, index: str = 'A', name: str = '', rating: int = None,
+                 tags: tuple[str] = ()) -> cf.Problem:
+    return cf.Problem(index=index, name=name, type=cf.ProblemType.PROGRAMMING,
+                      tags=tags, contestId=contest_id, rating=rating)
+
+
+def make_submission(id_: int, verdict: str, contest_id: int = 1497, index: str = 'A',
+                    handle: str = 'tourist') -> cf.Submission:
+    author = cf.Party(members=(cf.Member(handle=handle),), participantType=cf.ParticipantType.PRACTICE,
+                      ghost=False)
+    return cf.Submission(
+        id=id_, creationTimeSeconds=0, relativeTimeSeconds=0, problem=make_problem(contest_id, index, index),
+        author=author, programmingLanguage='C++', verdict=verdict, testset='TESTS',
+        passedTestCount=0, timeConsumedMillis=0, memoryConsumedBytes=0
+    )
+
+
+def _exclude(doc: dict, projection: Optional[dict]) -> dict:
+    return {k: v for k, v in doc.items() if (projection or {}).get(k) is not False}
+
+
+class FakeCollection:
+    # serves fixed documents, filtered by _id only and without their excluded
+    # fields, and records the writes as lists of bulk operations
+    # pylint: disable=redefined-builtin
+
+    def __init__(self, docs: list[dict] = ()) -> None:
+        self.docs = list(docs)
+        self.writes = []
+
+    def find(self, filter: dict = None, projection: dict = None) -> list[dict]:
+        ids = (filter or {}).get('_id', {}).get('$in')
+        return [_exclude(doc, projection) for doc in self.docs if ids is None or doc['_id'] in ids]
+
+    def find_one(self, filter: dict, projection: dict = None) -> Optional[dict]:
+        docs = (doc for doc in self.docs if doc['_id'] == filter['_id'])
+        return next((_exclude(doc, projection) for doc in docs), None)
+
+    def bulk_write(self, requests: list, ordered: bool = True) -> None:
+        self.writes.append(list(requests))
+
+    def update_many(self, filter: dict, update: dict) -> None:
+        self.writes.append([UpdateMany(filter, update)])
+
+    def delete_many(self, filter: dict) -> None:
+        self.writes.append([DeleteMany(filter)])
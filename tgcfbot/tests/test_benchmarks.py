@@ -0,0 +1,12 @@
+from .. import codeforces_api as cf
+from ..benchmarks import fake_server, fixtures, suite
+
+
+def test_suite_smoke(monkeypatch) -> None:
+    results = fixtures.generate(problems=50, submissions=40, rows=20)
+    assert suite.bench_codec(results, number=1).keys() == {'from_json problems', 'from_json submissions'}
+    with fake_server.serve(results) as server:
+        monkeypatch.setattr(cf, 'client', cf.Client(base_url=server.base_url, rate=1e6, burst=1e6, retries=0))
+        timings = suite.bench_api(number=1)
+    assert 'contest.iter_standings' in timings
+    assert all(seconds >= 0 for seconds in timings.values())
@@ -0,0 +1,45 @@
+from ..cache import TTLCache
+from .helpers import FakeClock
+
+
+def test_expire() -> None:
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set('a', 1)
+    clock.now = 9
+    assert cache.get('a') == 1
+    clock.now = 10
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_lru() -> None:
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_invalidate() -> None:
+    cache = TTLCache()
+    cache.set('1497', [1], tags=['1497A', '1497B'])
+    cache.set('meximization', [2], tags=['1497A'])
+    cache.set('theatre', [3], tags=['1A'])
+    assert cache.invalidate('1497A') == 2
+    assert cache.get('1497') is None
+    assert cache.get('theatre') == [3]
+    assert cache.invalidate('1497B') == 0
+
+
+def test_generation() -> None:
+    cache = TTLCache()
+    generation = cache.generation()
+    cache.invalidate('1A')
+    assert not cache.set('q', 1, tags=['1A'], generation=generation)
+    assert cache.get('q') is None
+    assert cache.set('q', 1, tags=['1A'], generation=cache.generation())
+    assert cache.get('q') == 1
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from .. import codeforces_api as cf
@@ -41,3 +43,102 @@ class TestUsers:
     def test_wrong_user(self):
         with pytest.raises(cf.APIError):
             cf.user.info(handles=['pi'])
+
+
+class TestJson:
+    data = {
+        'contestId': 1497,
+        'index': 'A',
+        'name': 'Meximization',
+        'type': 'PROGRAMMING',
+        'rating': 800,
+        'tags': ['brute force', 'greedy', 'sortings'],
+    }
+
+    def test_from_json(self) -> None:
+        data = dict(self.data)
+        problem = cf.from_json(cf.Problem, data)
+        assert problem.mention == '1497A'
+        assert problem.tags == ('brute force', 'greedy', 'sortings')
+        assert data == self.data
+
+    def test_nested(self) -> None:
+        party = cf.from_json(cf.Party, {
+            'members': [{'handle': 'tourist'}],
+            'participantType': 'CONTESTANT',
+            'ghost': False,
+        })
+        assert party.members == (cf.Member(handle='tourist'),)
+        assert cf.to_json(party) == {
+            'members': [{'handle': 'tourist'}],
+            'participantType': 'CONTESTANT',
+            'ghost': False,
+        }
+
+    def test_to_json(self) -> None:
+        problem = cf.from_json(cf.Problem, self.data)
+        assert cf.to_json(problem) == {**self.data, 'tags': tuple(self.data['tags'])}
+        assert cf.from_json(cf.Problem, cf.to_json(problem)) == problem
+
+    def test_shared_objects_keep_their_type(self) -> None:
+        # the one tag tuple ('greedy',) equals Member('greedy')
+        cf.from_json(cf.Problem, {**self.data, 'tags': ['greedy']})
+        party = cf.from_json(cf.Party, {
+            'members': [{'handle': 'greedy'}],
+            'participantType': 'CONTESTANT',
+            'ghost': False,
+        })
+        assert party.members[0].handle == 'greedy'
+
+    def test_numeric_rank(self) -> None:
+        # rank is a string on User but a number on these
+        change = cf.from_json(cf.RatingChange, {
+            'contestId': 1497, 'contestName': 'Round', 'handle': 'tourist', 'rank': 3,
+            'ratingUpdateTimeSeconds': 0, 'oldRating': 3000, 'newRating': 3100,
+        })
+        assert change.rank == 3
+        row = cf.from_json(cf.RanklistRow, {
+            'party': {'members': [{'handle': 'tourist'}], 'participantType': 'CONTESTANT', 'ghost': False},
+            'rank': 1, 'points': 500.0, 'penalty': 0, 'successfulHackCount': 0,
+            'unsuccessfulHackCount': 0,
+            'problemResults': [{'points': 500.0, 'rejectedAttemptCount': 0, 'type': 'FINAL'}],
+        })
+        assert row.rank == 1
+        assert row.problemResults[0].type == 'FINAL'
+        user = cf.from_json(cf.User, {
+            'handle': 'tourist', 'rank': 'legendary grandmaster', 'contribution': 0,
+            'lastOnlineTimeSeconds': 0, 'registrationTimeSeconds': 0, 'friendOfCount': 0,
+            'avatar': '', 'titlePhoto': '',
+        })
+        assert user.rank == 'legendary grandmaster'
+
+
+class TestStream:
+    text = json.dumps({
+        'status': 'OK',
+        'result': {
+            'contest': {'id': 1, 'name': 'Round'},
+            'rows': [{'rank': i, 'points': i * 0.5} for i in range(1, 50)],
+        }
+    }, indent=1)
+
+    @staticmethod
+    def chunks(text: str, size: int) -> list[str]:
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    @pytest.mark.parametrize('size', [1, 7, 1 << 16])
+    def test_items(self, size: int) -> None:
+        stream = cf._JSONStream(self.chunks(self.text, size))
+        stream.seek(['result', 'rows'])
+        assert list(stream.items()) == json.loads(self.text)['result']['rows']
+
+    def test_failed(self) -> None:
+        text = json.dumps({'status': 'FAILED', 'comment': 'handle: not found'})
+        stream = cf._JSONStream(self.chunks(text, 3))
+        with pytest.raises(cf.APIError, match='not found'):
+            stream.seek(['result'])
+
+    def test_empty(self) -> None:
+        stream = cf._JSONStream(['{"status": "OK", "result": [ ]}'])
+        stream.seek(['result'])
+        assert list(stream.items()) == []
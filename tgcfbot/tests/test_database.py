@@ -0,0 +1,105 @@
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+from .. import constants
+from ..database import Database, QueryPlan, SyncResult, _problem_doc
+from ..problem_index import ProblemIndex
+from ..sampler import WeightedSampler
+from ..search import SearchIndex
+from .helpers import FakeCollection, make_problem
+
+
+def make_database(problems: list, loaded: bool = True) -> Database:
+    db = Database.__new__(Database)
+    db.problems = FakeCollection([_problem_doc(p) for p in problems])
+    db.scores = FakeCollection()
+    db.index = db.search = db.sampler = None
+    if loaded:
+        db.index = ProblemIndex(problems)
+        db.search = SearchIndex(problems)
+        db.sampler = WeightedSampler(problems, {}, {})
+    return db
+
+
+def test_sync_problems() -> None:
+    same = make_problem(1, name='same', rating=800)
+    renamed = make_problem(2, name='old name', rating=800, tags=('dp',))
+    rerated = make_problem(3, name='rerated', rating=1200)
+    db = make_database([same, renamed, rerated])
+
+    new = make_problem(4, name='brand new', rating=1200)
+    problems = [same, renamed._replace(name='new name'), rerated._replace(rating=None), new]
+    assert db.sync_problems(problems) == SyncResult(inserted=1, updated=2, unchanged=1)
+
+    writes, = db.problems.writes
+    name_hash = _problem_doc(problems[1])['_hash']
+    rating_hash = _problem_doc(problems[2])['_hash']
+    assert writes == [
+        UpdateOne({'_id': '2A'}, {'$set': {'name': 'new name', '_hash': name_hash}}),
+        UpdateOne({'_id': '3A'}, {'$set': {'_hash': rating_hash}, '$unset': {'rating': ''}}),
+        InsertOne(_problem_doc(new)),
+    ]
+    init_score = {title: [] for title in constants.emojis}
+    init_score['counts'] = {title: 0 for title in constants.emojis}
+    assert db.scores.writes == [[UpdateOne({'_id': '4A'}, {'$setOnInsert': init_score}, upsert=True)]]
+
+    # the loaded indexes follow the changed problems without a reload
+    assert [p.name for p in db.query_problem('name')] == ['new name']
+    assert db.query_problem('brand')[0] == new
+    assert len(db.index) == 3
+    assert db.sample_problem(min_rating=1200, max_rating=1200) == new
+
+
+def test_sync_problems_unchanged() -> None:
+    problems = [make_problem(1, rating=800), make_problem(2)]
+    db = make_database(problems)
+    assert db.sync_problems(problems) == SyncResult(inserted=0, updated=0, unchanged=2)
+    assert db.problems.writes == [] and db.scores.writes == []
+
+
+def test_sync_problems_not_loaded() -> None:
+    db = make_database([], loaded=False)
+    assert db.sync_problems([make_problem(1)]) == SyncResult(inserted=1, updated=0, unchanged=0)
+    assert db.search is None
+
+
+class ExplainedCursor:
+    def __init__(self, name: str, query: dict) -> None:
+        self.name = name
+        self.query = query
+        self.stages = ['FETCH', 'IXSCAN']
+
+    def sort(self, key: str, direction: int) -> 'ExplainedCursor':
+        self.stages = ['SORT', *self.stages]
+        return self
+
+    def limit(self, count: int) -> 'ExplainedCursor':
+        self.stages = ['LIMIT', *self.stages]
+        return self
+
+    def explain(self) -> dict:
+        if self.name == 'leaderboard':
+            raise OperationFailure('not authorized')
+        plan = {}
+        for stage in reversed(self.stages):
+            plan = {'stage': stage, 'inputStage': plan} if plan else {'stage': stage}
+        return {'queryPlanner': {'winningPlan': plan}}
+
+
+class ExplainedCollection:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def find(self, query: dict, projection: dict = None) -> ExplainedCursor:
+        return ExplainedCursor(self.name, query)
+
+
+def test_explain_queries() -> None:
+    db = Database.__new__(Database)
+    for name in ['users', 'problems', 'scores', 'solved', 'feeds', 'leaderboard']:
+        setattr(db, name, ExplainedCollection(name))
+    plans = {plan.name: plan for plan in db.explain_queries()}
+    assert 'get_problem' not in plans
+    assert plans['due_feeds'] == QueryPlan('due_feeds', ['LIMIT', 'SORT', 'FETCH', 'IXSCAN'])
+    assert plans['get_voters'].stages == ['FETCH', 'IXSCAN']
+    assert plans['get_leaderboard'].error == 'not authorized'
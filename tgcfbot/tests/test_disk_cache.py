@@ -0,0 +1,57 @@
+import pytest
+
+from .. import codeforces_api as cf
+from ..disk_cache import ResponseCache
+from .helpers import FakeClock
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock(1000.0)
+
+
+@pytest.fixture
+def cache(tmp_path, clock: FakeClock) -> ResponseCache:
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttls={'user.info': 10},
+                          stale=100, max_entries=2, clock=clock)
+    yield cache
+    cache.close()
+
+
+def test_fresh_and_stale(cache: ResponseCache, clock: FakeClock) -> None:
+    assert not cache.cacheable('user.status')
+    assert cache.get('user.info', {'handles': 'tourist'}) is None
+    cache.put('user.info', {'handles': 'tourist'}, [{'handle': 'tourist'}])
+    assert cache.get('user.info', {'handles': 'tourist'}) == ([{'handle': 'tourist'}], True)
+    clock.now += 50
+    assert cache.get('user.info', {'handles': 'tourist'}) == ([{'handle': 'tourist'}], False)
+    clock.now += 100
+    assert cache.get('user.info', {'handles': 'tourist'}) is None
+
+
+def test_key_normalized(cache: ResponseCache) -> None:
+    cache.put('user.info', {'b': 1, 'a': True}, 1)
+    assert cache.get('user.info', {'a': 'True', 'b': '1'}) == (1, True)
+
+
+def test_eviction(cache: ResponseCache, clock: FakeClock) -> None:
+    for i in range(3):
+        clock.now += 1
+        cache.put('user.info', {'handles': i}, i)
+        if i == 1:
+            clock.now += 1
+            cache.get('user.info', {'handles': 0})
+    assert cache.get('user.info', {'handles': 0}) is not None
+    assert cache.get('user.info', {'handles': 1}) is None
+    assert cache.get('user.info', {'handles': 2}) is not None
+
+
+def test_client_allow_stale(cache: ResponseCache, clock: FakeClock, monkeypatch) -> None:
+    client = cf.Client(cache=cache)
+    monkeypatch.setattr(client, '_call', lambda method, params: 'network')
+    monkeypatch.setattr(client, '_revalidate', lambda method, params: None)
+    cache.put('user.info', {'handles': 'tourist'}, 'cached')
+    assert client.call('user.info', {'handles': 'tourist'}, allow_stale=False) == 'cached'
+    clock.now += 50
+    assert client.call('user.info', {'handles': 'tourist'}) == 'cached'
+    assert client.call('user.info', {'handles': 'tourist'}, allow_stale=False) == 'network'
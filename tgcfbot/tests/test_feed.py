@@ -0,0 +1,58 @@
+from .. import codeforces_api as cf
+from ..database import FeedCursor
+from ..feed import advance
+from .helpers import make_submission
+
+
+def _advance(cursor: FeedCursor, submissions: list[cf.Submission]) -> tuple:
+    return advance(cursor, submissions, now=1000, min_interval=60, max_interval=3600)
+
+
+def test_first_poll_is_silent() -> None:
+    submissions = [make_submission(5, cf.Verdict.OK)]
+    cursor, solves = _advance(FeedCursor('tourist', None, [], 0, 0), submissions)
+    assert solves == []
+    assert cursor.last_id == 5
+    assert cursor.next_poll == 1060
+
+
+def test_new_solves_are_deduplicated() -> None:
+    submissions = [
+        make_submission(9, cf.Verdict.OK),
+        make_submission(8, cf.Verdict.WRONG_ANSWER, index='B'),
+        make_submission(7, cf.Verdict.OK),
+        make_submission(5, cf.Verdict.OK, index='C'),
+    ]
+    cursor, solves = _advance(FeedCursor('tourist', 5, [], 480, 0), submissions)
+    assert [(s.problem.mention, s.submission_id) for s in solves] == [('1497A', 7)]
+    assert cursor.last_id == 9
+    assert cursor.interval == 60
+
+
+def test_pending_is_reported_once() -> None:
+    submissions = [make_submission(6, cf.Verdict.TESTING)]
+    cursor, solves = _advance(FeedCursor('tourist', 5, [], 60, 0), submissions)
+    assert solves == [] and cursor.pending == [6]
+    cursor, solves = _advance(cursor, [make_submission(6, cf.Verdict.OK)])
+    assert [s.submission_id for s in solves] == [6]
+    assert cursor.pending == []
+    cursor, solves = _advance(cursor, [make_submission(6, cf.Verdict.OK)])
+    assert solves == []
+
+
+def test_idle_backoff() -> None:
+    cursor = FeedCursor('tourist', 5, [], 0, 0)
+    intervals = []
+    for _ in range(8):
+        cursor, _ = _advance(cursor, [make_submission(5, cf.Verdict.OK)])
+        intervals.append(cursor.interval)
+    assert intervals == [60, 120, 240, 480, 960, 1920, 3600, 3600]
+
+
+def test_queued_submission_is_pending() -> None:
+    data = cf.to_json(make_submission(6, cf.Verdict.OK))
+    del data['verdict']
+    queued = cf.from_json(cf.Submission, data)
+    assert queued.verdict is None and queued.testing
+    cursor, solves = _advance(FeedCursor('tourist', 5, [], 60, 0), [queued])
+    assert solves == [] and cursor.pending == [6]
@@ -0,0 +1,80 @@
+from .. import codeforces_api as cf
+from ..database import SyncResult
+from ..jobs import ProblemsetRefresher, ProfileRefresher
+
+
+def _user(handle: str) -> dict:
+    return {'handle': handle, 'contribution': 0, 'lastOnlineTimeSeconds': 0,
+            'registrationTimeSeconds': 0, 'friendOfCount': 0, 'avatar': '', 'titlePhoto': ''}
+
+
+def test_fetch_drops_unknown_handles(monkeypatch) -> None:
+    requested = []
+
+    def send_request(method: str, params: dict, use_cache: bool = True):
+        handles = params['handles'].split(';')
+        requested.append(handles)
+        for handle in handles:
+            if handle.startswith('ghost'):
+                raise cf.APIError(f'handles: User with handle {handle.upper()} not found')
+        return [_user('renamed' if handle == 'old' else handle) for handle in handles]
+
+    monkeypatch.setattr(cf, 'send_request', send_request)
+    users, invalid = ProfileRefresher(database=None).fetch(['tourist', 'ghost1', 'old', 'ghost2'])
+    assert invalid == ['ghost1', 'ghost2']
+    assert {handle: user.handle for handle, user in users.items()} == {'tourist': 'tourist', 'old': 'renamed'}
+    assert len(requested) == 3
+
+
+class FakeProblemStore:
+    def __init__(self) -> None:
+        self.synced = []
+        self.statistics = []
+
+    def sync_problems(self, problems: list[cf.Problem]) -> SyncResult:
+        self.synced.append(problems)
+        return SyncResult(inserted=len(problems), updated=0, unchanged=0)
+
+    def sync_statistics(self, statistics: list[cf.ProblemStatistics]) -> int:
+        self.statistics.append(statistics)
+        return len(statistics)
+
+
+def test_problemset_refresher(monkeypatch) -> None:
+    problem = {'contestId': 1, 'index': 'A', 'name': 'a', 'type': 'PROGRAMMING', 'tags': []}
+    results = [
+        {'problems': [problem], 'problemStatistics': [{'contestId': 1, 'index': 'A', 'solvedCount': 1}]},
+        {'problems': [problem], 'problemStatistics': [{'contestId': 1, 'index': 'A', 'solvedCount': 2}]},
+        {'problems': [problem], 'problemStatistics': []},
+        {'problems': [problem, {**problem, 'index': 'B'}], 'problemStatistics': []},
+    ]
+    calls = []
+
+    def send_request(method: str, params: dict, use_cache: bool = True, allow_stale: bool = True):
+        calls.append(use_cache)
+        return results[len(calls) - 1]
+
+    monkeypatch.setattr(cf, 'send_request', send_request)
+    store, changes = FakeProblemStore(), []
+    refresher = ProblemsetRefresher(store, on_change=lambda: changes.append(1))
+
+    assert refresher.run() == '1 new, 0 updated, 0 unchanged, 1 statistics changed'
+    # new solved counts alone do not sync the problems again
+    assert refresher.run() == 'problems unchanged, 1 statistics changed'
+    assert refresher.run(force=True) == '1 new, 0 updated, 0 unchanged, 0 statistics changed'
+    assert refresher.run() == '2 new, 0 updated, 0 unchanged, 0 statistics changed'
+    assert [len(p) for p in store.synced] == [1, 1, 2]
+    assert len(store.statistics) == 4
+    assert calls == [True, False, False, False]
+    assert len(changes) == 3
+    assert refresher.last_run.status.startswith('2 new')
+
+
+def test_problemset_refresher_already_running() -> None:
+    refresher = ProblemsetRefresher(FakeProblemStore())
+    refresher._lock.acquire()  # pylint: disable=protected-access
+    try:
+        assert refresher.run() == 'already running'
+    finally:
+        refresher._lock.release()  # pylint: disable=protected-access
+    assert refresher.last_run is None
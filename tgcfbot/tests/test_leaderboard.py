@@ -0,0 +1,88 @@
+from pymongo import DeleteMany, ReplaceOne, UpdateMany, UpdateOne
+
+from .. import codeforces_api as cf
+from ..database import Database, _leaderboard_entry, _leaderboard_keys, _problem_doc, rating_band
+from .helpers import FakeCollection, make_problem
+
+
+def test_keys() -> None:
+    problem = cf.Problem(index='A', name='a', type=cf.ProblemType.PROGRAMMING, tags=('dp', 'math'),
+                         contestId=1497, rating=1550)
+    assert rating_band(problem.rating) == '1400'
+    assert _leaderboard_keys(problem) == [
+        'all|all', 'all|1400', 'dp|all', 'dp|1400', 'math|all', 'math|1400'
+    ]
+    assert _leaderboard_keys(problem._replace(rating=None, tags=())) == ['all|all']
+
+
+def test_entry() -> None:
+    problem = cf.Problem(index='A', name='a', type=cf.ProblemType.PROGRAMMING, tags=(), contestId=1)
+    entry = _leaderboard_entry(problem, {'like': 5, 'dislike': 2, 'hard': 9})
+    assert (entry['mention'], entry['score'], entry['like'], entry['dislike']) == ('1A', 3, 5, 2)
+
+
+def make_database(problems: list[cf.Problem], counts: dict[str, dict[str, int]]) -> Database:
+    db = Database.__new__(Database)
+    db.problems = FakeCollection([_problem_doc(p) for p in problems])
+    db.scores = FakeCollection([{'_id': mention, 'counts': c} for mention, c in counts.items()])
+    db.leaderboard = FakeCollection()
+    db.sampler = None
+    return db
+
+
+def test_update_leaderboard() -> None:
+    liked = make_problem(1, name='liked', rating=1550, tags=('dp',))
+    disliked = make_problem(2, name='disliked')
+    db = make_database([liked, disliked], {})
+    db.update_leaderboard({'1A': {'like': 3, 'dislike': 1}, '2A': {'like': 1, 'dislike': 1}})
+
+    entry = _leaderboard_entry(liked, {'like': 3, 'dislike': 1})
+    push = {'$push': {'entries': {'$each': [entry], '$sort': {'score': -1, 'like': -1}, '$slice': 40}}}
+    ops, = db.leaderboard.writes
+    assert ops == [
+        op for key in ['all|all', 'all|1400', 'dp|all', 'dp|1400'] for op in [
+            UpdateOne({'_id': key}, {'$pull': {'entries': {'mention': '1A'}}}),
+            UpdateOne({'_id': key}, push, upsert=True),
+        ]
+    ] + [UpdateOne({'_id': 'all|all'}, {'$pull': {'entries': {'mention': '2A'}}})]
+
+
+def test_rebuild_leaderboard() -> None:
+    problems = [make_problem(i, name=str(i)) for i in range(1, 5)]
+    db = make_database(problems, {
+        '1A': {'like': 2, 'dislike': 0},
+        '2A': {'like': 5, 'dislike': 1},
+        '3A': {'like': 4, 'dislike': 0},
+        '4A': {'like': 1, 'dislike': 3},
+    })
+    assert db.rebuild_leaderboard() == 1
+    (replace,), (delete,) = db.leaderboard.writes
+    assert replace == ReplaceOne({'_id': 'all|all'}, {'entries': [
+        _leaderboard_entry(problems[i], counts) for i, counts in [
+            (1, {'like': 5, 'dislike': 1}), (2, {'like': 4, 'dislike': 0}), (0, {'like': 2, 'dislike': 0})
+        ]
+    ]}, upsert=True)
+    assert delete == DeleteMany({'_id': {'$nin': ['all|all']}})
+
+
+def test_get_leaderboard() -> None:
+    db = make_database([], {})
+    entries = [{'mention': '2A', 'score': 4}, {'mention': '1A', 'score': 2}]
+    db.leaderboard = FakeCollection([{'_id': 'dp|1400', 'entries': entries}])
+    assert db.get_leaderboard('dp', '1400') == entries
+    assert db.get_leaderboard('dp', '1600') == []
+
+
+def test_refresh_leaderboard() -> None:
+    renamed = make_problem(1, name='new name', rating=1900)
+    db = make_database([renamed, make_problem(2)], {
+        '1A': {'like': 1, 'dislike': 0},
+        '2A': {'like': 0, 'dislike': 2},
+    })
+    db.refresh_leaderboard(['1A', '2A'])
+    (pull,), pushes = db.leaderboard.writes
+    assert pull == UpdateMany({'entries.mention': {'$in': ['1A']}},
+                              {'$pull': {'entries': {'mention': {'$in': ['1A']}}}})
+    entry = pushes[1]._doc['$push']['entries']['$each'][0]
+    assert entry['html'] == renamed.html and entry['score'] == 1
+    assert [op._filter['_id'] for op in pushes[1::2]] == ['all|all', 'all|1800']
@@ -0,0 +1,43 @@
+import pytest
+
+from ..metrics import Histogram, Registry
+
+
+def test_histogram_quantile() -> None:
+    histogram = Histogram(buckets=(0.01, 0.1, 1, float('inf')))
+    for seconds in [0.005] * 90 + [0.05] * 9 + [5]:
+        histogram.observe(seconds)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.99) == 0.1
+    assert histogram.quantile(1) == float('inf')
+
+
+def test_registry_errors() -> None:
+    registry = Registry()
+
+    @registry.timer('handler')
+    def fail() -> None:
+        raise ValueError()
+
+    with registry.timed('mongo', 'find'):
+        pass
+    with pytest.raises(ValueError):
+        fail()
+
+    assert registry.histogram('mongo', 'find').count == 1
+    assert registry.histogram('handler', 'fail').errors == 1
+    text = registry.prometheus()
+    assert 'tgcfbot_errors_total{kind="handler",name="fail"} 1' in text
+    assert 'tgcfbot_latency_seconds_count{kind="mongo",name="find"} 1' in text
+
+
+def test_summary_kind() -> None:
+    registry = Registry()
+    with registry.timed('mongo', 'find'):
+        pass
+    with registry.timed('job', 'refresh'):
+        pass
+    assert len(registry.summary()) == 2
+    assert [line.split(':')[0] for line in registry.summary('job')] == ['job refresh']
+    assert registry.summary('handler') == []
@@ -0,0 +1,87 @@
+import threading
+
+from telegram.error import RetryAfter
+
+from ..outbox import BROADCAST, INTERACTIVE, Outbox
+from .helpers import FakeClock
+
+
+def drain(outbox: Outbox, clock: FakeClock) -> None:
+    # sends on the test thread, moving the clock on whenever every job has to wait
+    while outbox.pending():
+        with outbox._cond:  # pylint: disable=protected-access
+            taken, wait = outbox._take()  # pylint: disable=protected-access
+        if taken is None:
+            clock.now += wait
+        else:
+            outbox._send(*taken)  # pylint: disable=protected-access
+
+
+def test_priority_and_chat_limit() -> None:
+    clock = FakeClock()
+    outbox = Outbox(global_rate=1000, private_rate=5, burst=1, workers=1, clock=clock)
+    sent = []
+    futures = [
+        outbox.submit(1, lambda: sent.append(('a1', clock.now))),
+        outbox.submit(1, lambda: sent.append(('a2', clock.now))),
+        outbox.submit(2, lambda: sent.append(('b', clock.now)), priority=BROADCAST),
+        outbox.submit(3, lambda: sent.append(('c', clock.now)), priority=INTERACTIVE),
+    ]
+    drain(outbox, clock)
+    assert all(future.done() for future in futures)
+    # chat 1 waits for its bucket while the others go out
+    assert sent == [('a1', 0), ('c', 0), ('b', 0), ('a2', 0.2)]
+
+
+def test_retry_after() -> None:
+    clock = FakeClock()
+    outbox = Outbox(global_rate=1000, private_rate=1000, clock=clock)
+    calls = []
+
+    def flaky() -> str:
+        calls.append(clock.now)
+        if len(calls) == 1:
+            raise RetryAfter(0.1)
+        return 'ok'
+
+    future = outbox.submit(1, flaky)
+    drain(outbox, clock)
+    assert future.result(timeout=0) == 'ok'
+    assert calls == [0, 0.1]
+
+
+def test_submit_latest() -> None:
+    clock = FakeClock()
+    outbox = Outbox(global_rate=1000, private_rate=1000, clock=clock)
+    sent = []
+    futures = [outbox.submit_latest('m', 1, lambda i=i: sent.append((i, clock.now)) or i, delay=0.1)
+               for i in range(3)]
+    drain(outbox, clock)
+    assert [f.result(timeout=0) for f in futures] == [2, 2, 2]
+    future = outbox.submit_latest('m', 1, lambda: sent.append((3, clock.now)) or 3)
+    drain(outbox, clock)
+    assert future.result(timeout=0) == 3
+    assert sent == [(2, 0.1), (3, 0.1)]
+
+
+def test_workers_send_in_parallel() -> None:
+    outbox = Outbox(global_rate=1000, private_rate=1000, workers=4)
+    # each first message waits until the four chats are being sent at once
+    together = threading.Barrier(4, timeout=5)
+    sent = []
+
+    def send(chat_id: int, i: int) -> None:
+        if i == 0:
+            together.wait()
+        sent.append((chat_id, i))
+
+    futures = [outbox.submit(chat_id, lambda c=chat_id, i=i: send(c, i))
+               for i in range(2) for chat_id in range(4)]
+    outbox.start()
+    for future in futures:
+        future.result(timeout=5)
+    outbox.stop()
+    # a chat still gets its messages in order
+    for chat_id in range(4):
+        assert [i for c, i in sent if c == chat_id] == [0, 1]
+    assert outbox.pending() == 0
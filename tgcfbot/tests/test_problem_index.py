@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from ..problem_index import ProblemIndex
+from .helpers import make_problem
+
+
+@pytest.fixture(scope='module')
+def index() -> ProblemIndex:
+    return ProblemIndex([
+        make_problem(1, rating=800, tags=('math',)),
+        make_problem(2, rating=1200, tags=('dp', 'math')),
+        make_problem(3, rating=1200, tags=('dp',)),
+        make_problem(4, rating=1600, tags=('dp', 'greedy')),
+        make_problem(5, rating=None, tags=('dp',)),
+    ] + [make_problem(100 + i, rating=2000, tags=('greedy',)) for i in range(100)])
+
+
+def test_rating_window(index: ProblemIndex) -> None:
+    rnd = random.Random(0)
+    found = {index.sample(min_rating=1000, max_rating=1600, rnd=rnd).mention for _ in range(100)}
+    assert found == {'2A', '3A', '4A'}
+
+
+def test_tags_and_exclude(index: ProblemIndex) -> None:
+    rnd = random.Random(0)
+    for _ in range(20):
+        problem = index.sample(tags=['dp'], exclude=['2A', '3A'], rnd=rnd)
+        assert problem.mention == '4A'
+    assert index.sample(tags=['dp', 'math'], max_rating=1000) is None
+    assert index.sample(tags=['unknown']) is None
+
+
+def test_sparse_mask(index: ProblemIndex) -> None:
+    rnd = random.Random(0)
+    exclude = [f'{100 + i}A' for i in range(99)]
+    for _ in range(20):
+        assert index.sample(min_rating=2000, exclude=exclude, rnd=rnd).mention == '199A'
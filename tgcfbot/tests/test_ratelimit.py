@@ -0,0 +1,68 @@
+import json
+
+import pytest
+import requests
+
+from .. import codeforces_api as cf
+from ..ratelimit import TokenBucket
+from .helpers import FakeClock
+
+
+def test_token_bucket_burst() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, capacity=2, clock=clock)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.delay() == 2.0
+
+
+def test_token_bucket_refill() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=1, clock=clock)
+    assert bucket.try_acquire()
+    clock.now += 0.25
+    assert not bucket.try_acquire()
+    clock.now += 10
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+class FakeSession:
+    def __init__(self, responses: list[tuple[int, dict]]) -> None:
+        self.responses = responses
+        self.calls = 0
+
+    def get(self, **_) -> requests.Response:
+        status, body = self.responses[self.calls]
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        return response
+
+
+def _client(responses: list[tuple[int, dict]]) -> cf.Client:
+    client = cf.Client(rate=1000, burst=10, retries=2, backoff=0)
+    client.session = FakeSession(responses)
+    return client
+
+
+def test_retry_server_errors() -> None:
+    ok = (200, {'status': 'OK', 'result': 1})
+    client = _client([(502, {}), (503, {'status': 'FAILED', 'comment': 'down'}), ok])
+    assert client.call('user.info', {}) == 1
+    assert client.stats()['retries'] == 2
+
+    limited = (429, {'status': 'FAILED', 'comment': 'Call limit exceeded'})
+    client = _client([limited, limited, limited])
+    with pytest.raises(cf.APIError, match='Call limit exceeded'):
+        client.call('user.info', {})
+    assert client.session.calls == 3
+
+
+def test_client_errors_are_final() -> None:
+    client = _client([(400, {'status': 'FAILED', 'comment': 'handles: User with handle pi not found'})])
+    with pytest.raises(cf.APIError, match='not found'):
+        client.call('user.info', {'handles': 'pi'})
+    assert client.session.calls == 1
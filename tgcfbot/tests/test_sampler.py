@@ -0,0 +1,51 @@
+import random
+from collections import Counter
+
+from ..sampler import AliasTable, WeightedSampler
+from .helpers import make_problem
+
+
+def test_alias_table() -> None:
+    rnd = random.Random(0)
+    table = AliasTable([1, 2, 0, 7])
+    counts = Counter(table.draw(rnd) for _ in range(20000))
+    assert counts[2] == 0
+    assert abs(counts[3] / 20000 - 0.7) < 0.02
+    assert abs(counts[0] / 20000 - 0.1) < 0.02
+
+
+def test_votes_shift_weights() -> None:
+    rnd = random.Random(0)
+    problems = [
+        make_problem(1, rating=800),
+        make_problem(2, rating=800),
+        make_problem(3, rating=1200, tags=('dp',)),
+    ]
+    sampler = WeightedSampler(problems, solved_counts={'1A': 1000, '2A': 1000}, votes={})
+    sampler.update_votes('1A', {'like': 9, 'dislike': 0})
+    sampler.update_votes('2A', {'like': 0, 'dislike': 4})
+    counts = Counter(sampler.sample(max_rating=1000, rnd=rnd).mention for _ in range(5000))
+    assert counts['1A'] > 20 * counts['2A']
+
+
+def test_filters() -> None:
+    rnd = random.Random(0)
+    problems = [
+        make_problem(1, rating=800),
+        make_problem(2, rating=800),
+        make_problem(3, rating=1200, tags=('dp',)),
+    ]
+    sampler = WeightedSampler(problems, solved_counts={}, votes={})
+    assert sampler.sample(tags=['dp'], rnd=rnd).mention == '3A'
+    assert sampler.sample(exclude={'1A', '3A'}, rnd=rnd).mention == '2A'
+    assert sampler.sample(min_rating=1300, rnd=rnd) is None
+
+
+def test_update_problems() -> None:
+    rnd = random.Random(0)
+    problems = [make_problem(1, rating=800), make_problem(2, rating=1200)]
+    sampler = WeightedSampler(problems, solved_counts={}, votes={})
+    sampler.update_problems([make_problem(2, rating=800, tags=('dp',)), make_problem(4, rating=1600)])
+    assert sampler.sample(min_rating=1000, max_rating=1400, rnd=rnd) is None
+    assert sampler.sample(tags=['dp'], max_rating=800, rnd=rnd).mention == '2A'
+    assert sampler.sample(min_rating=1600, rnd=rnd).mention == '4A'
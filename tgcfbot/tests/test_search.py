@@ -0,0 +1,45 @@
+import pytest
+
+from .. import codeforces_api as cf
+from ..search import SearchIndex
+from .helpers import make_problem
+
+
+@pytest.fixture
+def index() -> SearchIndex:
+    return SearchIndex([
+        make_problem(1497, 'A', 'Meximization', 800, ('brute force', 'greedy', 'sortings')),
+        make_problem(1497, 'B', 'M-arrays', 1200, ('constructive algorithms', 'greedy', 'math')),
+        make_problem(1497, 'E2', 'Square-free division (hard version)', 2500,
+                 ('data structures', 'dp', 'greedy', 'math', 'number theory', 'two pointers')),
+        make_problem(149, 'A', 'Business trip', 900, ('greedy', 'implementation', 'sortings')),
+        make_problem(1, 'A', 'Theatre Square', 1000, ('math',)),
+    ])
+
+
+def _mentions(problems: list[cf.Problem]) -> list[str]:
+    return [p.mention for p in problems]
+
+
+def test_mention(index: SearchIndex) -> None:
+    assert _mentions(index.search('1497a'))[0] == '1497A'
+    assert set(_mentions(index.search('149'))) == {'149A', '1497A', '1497B', '1497E2'}
+
+
+def test_name(index: SearchIndex) -> None:
+    assert _mentions(index.search('theatre'))[0] == '1A'
+    assert _mentions(index.search('squre free divison'))[0] == '1497E2'
+
+
+def test_filters(index: SearchIndex) -> None:
+    assert _mentions(index.search('149 r:800-1000')) == ['149A', '1497A']
+    assert _mentions(index.search('tag:data_str')) == ['1497E2']
+    assert _mentions(index.search('tag:greedy tag:math 1497')) == ['1497B', '1497E2']
+
+
+def test_incremental(index: SearchIndex) -> None:
+    index.add([make_problem(1, 'A', 'Theatre Square', 1100, ('math',)),
+               make_problem(1500, 'A', 'Going Home')])
+    assert len(index) == 6
+    assert index.search('theatre')[0].rating == 1100
+    assert _mentions(index.search('going')) == ['1500A']
@@ -0,0 +1,55 @@
+from .. import codeforces_api as cf
+from .. import standings as st
+
+
+class FakeHandles:
+    def __init__(self, handles: list[str]) -> None:
+        self.handles = handles
+
+    def get_handles(self) -> list[str]:
+        return self.handles
+
+
+def _standings(phase: str, points: float) -> tuple:
+    contest = cf.Contest(id=1, name='Round 1', type=cf.ContestType.CF, phase=phase,
+                         frozen=False, durationSeconds=7200)
+    party = cf.Party(members=(cf.Member(handle='tourist'),), participantType=cf.ParticipantType.CONTESTANT,
+                     ghost=False)
+    results = (
+        cf.ProblemResult(points=points, rejectedAttemptCount=0, type=cf.ProblemResultType.PRELIMINARY),
+        cf.ProblemResult(points=0, rejectedAttemptCount=2, type=cf.ProblemResultType.PRELIMINARY),
+    )
+    row = cf.RanklistRow(party=party, rank=1, points=points, penalty=0, successfulHackCount=0,
+                         unsuccessfulHackCount=0, problemResults=results)
+    return contest, [], [row]
+
+
+def test_render() -> None:
+    text = st.render(st.Standings(*_standings(cf.ContestPhase.CODING, 500)))
+    assert 'Round 1' in text
+    assert '1. tourist 500 [0] <code>+-</code>' in text
+
+
+def test_poll(monkeypatch) -> None:
+    calls = []
+    answers = iter([
+        _standings(cf.ContestPhase.CODING, 0),
+        _standings(cf.ContestPhase.CODING, 0),
+        _standings(cf.ContestPhase.FINISHED, 500),
+    ])
+
+    def standings(**kwargs):
+        calls.append(kwargs)
+        return next(answers)
+
+    monkeypatch.setattr(cf.contest, 'standings', standings)
+    tracker = st.StandingsTracker(FakeHandles(['tourist']), ttl=0)
+    text = tracker.render(1)
+    assert calls[0]['handles'] == ['tourist']
+    tracker.watch(1, 10, 20, text)
+    tracker.watch(1, 11, 21, text)
+
+    assert tracker.poll() == []
+    edits = tracker.poll()
+    assert [(e.chat_id, e.message_id) for e in edits] == [(10, 20), (11, 21)]
+    assert tracker.watchers == {}
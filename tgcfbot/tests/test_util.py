@@ -2,6 +2,7 @@ import pytest
 
 from .. import util
 from .. import codeforces_api as cf
+from .helpers import make_submission
 
 
 def test_complete_tags() -> None:
@@ -10,6 +11,15 @@ def test_complete_tags() -> None:
     assert util.complete_tags(['deta']) == []
 
 
+def test_join_messages() -> None:
+    assert util.join_messages(['ab', 'cd', 'ef'], limit=5) == ['ab\ncd', 'ef']
+    assert util.join_messages(['abcdefg', 'h'], limit=5) == ['abcde', 'h']
+    assert util.join_messages([]) == []
+    texts = util.join_messages(['x' * 100] * 200)
+    assert all(len(text) <= 4096 for text in texts)
+    assert sum(text.count('x') for text in texts) == 20000
+
+
 @pytest.fixture(scope='module')
 def sgu_problems() -> list[cf.Problem]:
     return cf.problemset.problems(problemset_name='acmsguru')[0]
@@ -18,3 +28,53 @@ def sgu_problems() -> list[cf.Problem]:
 def test_sgu_not_valid(sgu_problems: list[cf.Problem]) -> None:
     valid = util.valid_problems(sgu_problems)
     assert len(valid) == 0
+
+
+class FakeSolvedStore:
+    def __init__(self, last_id: int = 0, problems: list[str] = None) -> None:
+        self.last_id = last_id
+        self.problems = problems or []
+
+    def get_solved(self, handle: str) -> tuple[int, list[str]]:
+        return self.last_id, list(self.problems)
+
+    def add_solved(self, handle: str, last_id: int, mentions: list[str]) -> None:
+        self.last_id = last_id
+        self.problems += mentions
+
+
+def test_solved_problems_incremental(monkeypatch: pytest.MonkeyPatch) -> None:
+    history = [
+        make_submission(6, cf.Verdict.TESTING, contest_id=1006),
+        make_submission(5, cf.Verdict.OK, contest_id=1005),
+        make_submission(4, cf.Verdict.WRONG_ANSWER, contest_id=1004),
+        make_submission(3, cf.Verdict.OK, contest_id=1003),
+        make_submission(2, cf.Verdict.OK, contest_id=1002),
+        make_submission(1, cf.Verdict.OK, contest_id=1001),
+    ]
+    calls = []
+
+    def status(*, handle: str, from_: int = None, count: int = None) -> list[cf.Submission]:
+        calls.append((from_, count))
+        return history[from_ - 1:from_ - 1 + count]
+
+    monkeypatch.setattr(cf.user, 'status', status)
+    monkeypatch.setattr(cf.user, 'iter_status', lambda *, handle: iter(history))
+    store = FakeSolvedStore(last_id=2, problems=['1001A', '1002A'])
+
+    solved = util.solved_problems(store, 'handle', page_size=2)
+    assert sorted(solved) == ['1001A', '1002A', '1003A', '1005A']
+    assert calls == [(1, 2), (3, 4)]
+    assert store.last_id == 5   # submission 6 is still testing
+
+    calls.clear()
+    history[0] = history[0]._replace(verdict=cf.Verdict.OK)
+    solved = util.solved_problems(store, 'handle', page_size=2)
+    assert '1006A' in solved
+    assert calls == [(1, 2)]
+    assert store.last_id == 6
+
+    store = FakeSolvedStore()
+    solved = util.solved_problems(store, 'handle')
+    assert sorted(solved) == ['1001A', '1002A', '1003A', '1005A', '1006A']
+    assert store.last_id == 6
@@ -0,0 +1,65 @@
+import pytest
+
+from ..votes import VoteBuffer
+
+
+class FakeScores:
+    def __init__(self) -> None:
+        self.voters = {'1A': {'like': [1], 'dislike': [], 'think': [], 'easy': [], 'hard': []}}
+        self.writes = []
+        self.fail = False
+
+    def get_voters(self, mention: str):
+        return self.voters.get(mention)
+
+    def get_scores(self, mention: str) -> dict[str, int]:
+        return {title: len(ids) for title, ids in self.voters[mention].items()}
+
+    def get_scores_many(self, mentions: list[str]) -> dict[str, dict[str, int]]:
+        return {mention: {'like': 0} for mention in mentions}
+
+    def apply_votes(self, votes: dict) -> None:
+        if self.fail:
+            raise RuntimeError('down')
+        self.writes.append(votes)
+
+
+def test_toggle_is_buffered() -> None:
+    store = FakeScores()
+    flushed = []
+    buffer = VoteBuffer(store, on_flush=flushed.extend)
+    assert buffer.toggle('1A', 'like', 1) is False
+    assert buffer.toggle('1A', 'like', 2) is True
+    assert buffer.toggle('1A', 'hard', 2) is True
+    assert buffer.toggle('1A', 'hard', 2) is False
+    assert buffer.get_scores('1A')['like'] == 1
+    assert store.writes == []
+
+    assert buffer.flush() == 1
+    assert store.writes == [{'1A': {'like': {1: False, 2: True}, 'hard': {2: False}}}]
+    assert flushed == ['1A']
+    assert buffer.flush() == 0
+
+    with pytest.raises(ValueError):
+        buffer.toggle('2A', 'like', 1)
+
+
+def test_failed_flush_keeps_votes() -> None:
+    store = FakeScores()
+    buffer = VoteBuffer(store)
+    buffer.toggle('1A', 'like', 2)
+    store.fail = True
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    buffer.toggle('1A', 'like', 2)
+    store.fail = False
+    buffer.flush()
+    assert store.writes == [{'1A': {'like': {2: False}}}]
+
+
+def test_scores_include_buffered_votes() -> None:
+    buffer = VoteBuffer(FakeScores())
+    buffer.toggle('1A', 'like', 2)
+    scores = buffer.get_scores_many(['1A', '2A'])
+    assert scores['1A']['like'] == 2
+    assert scores['2A'] == {'like': 0}
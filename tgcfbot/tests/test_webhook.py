@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+from queue import Queue
+
+import pytest
+import tornado.web
+from telegram import Bot, Update
+from telegram.error import NetworkError, Unauthorized
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+
+from ..webhook import SecretWebhookHandler, WebhookUpdater, post_update
+
+TOKEN = '123:token'
+UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 7, 'date': 0, 'text': '/gimme',
+        'chat': {'id': 42, 'type': 'private'},
+        'from': {'id': 42, 'is_bot': False, 'first_name': 'a'},
+    },
+}
+
+
+@pytest.fixture
+def webhook():
+    updates = Queue()
+    app = tornado.web.Application([(r'/telegram/?', SecretWebhookHandler, {
+        'bot': Bot(TOKEN), 'update_queue': updates, 'secret_token': 's3cret',
+    })])
+    sock, port = bind_unused_port()
+    started = threading.Event()
+    loops = []
+
+    def serve() -> None:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        HTTPServer(app).add_sockets([sock])
+        loops.append(IOLoop.current())
+        started.set()
+        loops[0].start()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+    yield f'http://127.0.0.1:{port}/telegram', updates
+    loops[0].add_callback(loops[0].stop)
+    thread.join(5)
+
+
+def test_secret_token(webhook, tmp_path) -> None:
+    url, updates = webhook
+    path = tmp_path / 'update.json'
+    path.write_text(json.dumps(UPDATE))
+    assert post_update(url, path) == 403
+    assert post_update(url, path, 'wrong') == 403
+    assert updates.empty()
+
+    assert post_update(url, path, 's3cret') == 200
+    update = updates.get(timeout=5)
+    assert isinstance(update, Update)
+    assert (update.update_id, update.message.text) == (1, '/gimme')
+
+
+def test_certificates_refused() -> None:
+    updater = WebhookUpdater(TOKEN, secret_token='s3cret')
+    with pytest.raises(ValueError):
+        updater.start_webhook(cert='cert.pem', key='key.pem')
+
+
+class FlakyBot:
+    def __init__(self, failures: list[Exception]) -> None:
+        self.failures = failures
+        self.calls = []
+
+    def set_webhook(self, **kwargs) -> bool:
+        self.calls.append(kwargs)
+        if self.failures:
+            raise self.failures.pop(0)
+        return True
+
+
+def test_register_webhook_retries(monkeypatch) -> None:
+    monkeypatch.setattr('telegram.ext.updater.sleep', lambda _: None)
+    updater = WebhookUpdater(TOKEN, secret_token='s3cret')
+    updater.running = True
+    updater.bot = FlakyBot([NetworkError('down'), NetworkError('down')])
+    updater._register_webhook(3, url='https://example.com/telegram')
+    assert len(updater.bot.calls) == 3
+    assert updater.bot.calls[-1] == {'secret_token': 's3cret', 'url': 'https://example.com/telegram'}
+
+    updater.bot = FlakyBot([NetworkError('down')] * 3)
+    with pytest.raises(NetworkError):
+        updater._register_webhook(2, url='https://example.com/telegram')
+    assert len(updater.bot.calls) == 3
+
+    updater.bot = FlakyBot([Unauthorized('bad token')])
+    with pytest.raises(Unauthorized):
+        updater._register_webhook(-1, url='https://example.com/telegram')
+    assert len(updater.bot.calls) == 1
@@ -0,0 +1,18 @@
+import threading
+
+from ..workers import BoundedPool
+
+
+def test_queue_limit() -> None:
+    pool = BoundedPool(workers=1, max_queue=1)
+    release = threading.Event()
+    first = pool.submit(release.wait)
+    second = pool.submit(lambda: 2)
+    assert pool.submit(lambda: 3) is None
+    assert pool.in_flight() == 2
+
+    release.set()
+    assert first.result(timeout=1)
+    assert second.result(timeout=1) == 2
+    pool.shutdown()
+    assert pool.in_flight() == 0
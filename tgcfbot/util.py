@@ -8,8 +8,7 @@ from . import codeforces_api as cf
 from .database import Database
 
 
-def score_markup(database: Database, mention: str) -> InlineKeyboardMarkup:
-    scores = database.get_scores(mention)
+def scores_markup(mention: str, scores: dict[str, int]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [
             InlineKeyboardButton(
@@ -28,8 +27,55 @@ def complete_tags(queries: list[str]) -> list[str]:
     return tags
 
 
+def join_messages(lines: list[str], limit: int = 4096) -> list[str]:
+    # telegram refuses messages over 4096 characters, longer lines are cut
+    texts, size = [[]], 0
+    for line in lines:
+        line = line[:limit]
+        if texts[-1] and size + 1 + len(line) > limit:
+            texts.append([])
+            size = 0
+        size += len(line) + bool(texts[-1])
+        texts[-1].append(line)
+    return ['\n'.join(text) for text in texts if text]
+
+
 def valid_problems(problems: list[cf.Problem]) -> list[cf.Problem]:
     return [
         problem for problem in problems
         if problem.contestId is not None and problem.contestId < 100000
     ]
+
+
+def solved_problems(database: Database, handle: str, page_size: int = 50) -> list[str]:
+    last_id, solved = database.get_solved(handle)
+
+    if last_id:
+        # page through newest submissions until reaching the known ones
+        fresh = []
+        from_, count = 1, page_size
+        while True:
+            page = cf.user.status(handle=handle, from_=from_, count=count)
+            fresh += [s for s in page if s.id > last_id]
+            if len(page) < count or page[-1].id <= last_id:
+                break
+            from_ += count
+            count *= 2
+    else:
+        fresh = cf.user.iter_status(handle=handle)
+
+    # submissions still in testing may turn OK later, keep them ahead of the cursor
+    new_last_id, pending, accepted = last_id, None, []
+    for submission in fresh:
+        new_last_id = max(new_last_id, submission.id)
+        if submission.testing:
+            pending = min(pending or submission.id, submission.id)
+        elif submission.verdict == cf.Verdict.OK:
+            accepted.append(submission.problem)
+    if pending is not None:
+        new_last_id = pending - 1
+
+    mentions = list({p.mention for p in valid_problems(accepted)} - set(solved))
+    if mentions or new_last_id != last_id:
+        database.add_solved(handle, new_last_id, mentions)
+    return solved + mentions
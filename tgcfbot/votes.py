@@ -0,0 +1,92 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from . import constants
+from .database import Database
+
+logger = logging.getLogger('votes')
+
+
+class VoteBuffer:
+    # votes are answered from memory and written in batches by flush(); the
+    # voters of recently voted problems are kept so a click needs no query
+
+    def __init__(self, database: Database, maxsize: int = 4096,
+                 on_flush: Callable[[list[str]], None] = None) -> None:
+        self.database = database
+        self.maxsize = maxsize
+        self.on_flush = on_flush
+        self._voters: OrderedDict[str, dict[str, set[int]]] = OrderedDict()
+        self._pending: dict[str, dict[str, dict[int, bool]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _insert(self, mention: str, stored: dict[str, list[int]]) -> dict[str, set[int]]:
+        # with the lock held; another click may have loaded the problem meanwhile
+        voters = self._voters.setdefault(mention, {title: set(ids) for title, ids in stored.items()})
+        while len(self._voters) > self.maxsize:
+            # problems with unwritten votes stay, the rest can be read again
+            evict = next((m for m in self._voters if m not in self._pending and m != mention), None)
+            if evict is None:
+                break
+            del self._voters[evict]
+        return voters
+
+    def toggle(self, mention: str, title: str, tg_id: int) -> bool:
+        stored = None
+        while True:
+            with self._lock:
+                if (voters := self._voters.get(mention)) is not None or stored is not None:
+                    if voters is None:
+                        voters = self._insert(mention, stored)
+                    self._voters.move_to_end(mention)
+                    voted = tg_id not in voters[title]
+                    if voted:
+                        voters[title].add(tg_id)
+                    else:
+                        voters[title].discard(tg_id)
+                    self._pending.setdefault(mention, {}).setdefault(title, {})[tg_id] = voted
+                    return voted
+            # read outside the lock so a miss does not stall other clicks
+            if (stored := self.database.get_voters(mention)) is None:
+                raise ValueError(f'no such {mention} problem')
+
+    def get_scores(self, mention: str) -> dict[str, int]:
+        with self._lock:
+            if (voters := self._voters.get(mention)) is not None:
+                return {title: len(voters[title]) for title in constants.emojis}
+        return self.database.get_scores(mention)
+
+    def get_scores_many(self, mentions: list[str]) -> dict[str, dict[str, int]]:
+        with self._lock:
+            scores = {
+                mention: {title: len(self._voters[mention][title]) for title in constants.emojis}
+                for mention in mentions if mention in self._voters
+            }
+        return scores | self.database.get_scores_many([m for m in mentions if m not in scores])
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(changes) for titles in self._pending.values() for changes in titles.values())
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                self.database.apply_votes(pending)
+            except Exception:
+                # put the votes back under the ones cast meanwhile
+                with self._lock:
+                    for mention, titles in pending.items():
+                        for title, changes in titles.items():
+                            merged = self._pending.setdefault(mention, {}).setdefault(title, {})
+                            self._pending[mention][title] = changes | merged
+                raise
+        if self.on_flush:
+            self.on_flush(list(pending))
+        return len(pending)
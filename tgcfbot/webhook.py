@@ -0,0 +1,107 @@
+import argparse
+import hmac
+import logging
+from typing import Any
+
+import requests
+import tornado.web
+from telegram.error import Unauthorized
+from telegram.ext import Updater
+from telegram.ext.utils.webhookhandler import WebhookHandler, WebhookServer
+
+logger = logging.getLogger('webhook')
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class SecretWebhookHandler(WebhookHandler):
+    def initialize(self, bot: Any, update_queue: Any, secret_token: str = None) -> None:
+        super().initialize(bot, update_queue)
+        self.secret_token = secret_token
+
+    def _validate_post(self) -> None:
+        if self.secret_token is not None:
+            token = self.request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(token, self.secret_token):
+                raise tornado.web.HTTPError(403)
+        super()._validate_post()
+
+
+class WebhookUpdater(Updater):
+    # python-telegram-bot 13 neither registers nor checks the webhook secret token,
+    # this serves the webhook with a handler that does and registers it on start
+
+    def __init__(self, *args, secret_token: str = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.secret_token = secret_token
+
+    def start_webhook(self, listen: str = '127.0.0.1', port: int = 80, url_path: str = '',
+                      cert: str = None, key: str = None, **kwargs) -> Any:
+        # the server below speaks plain http, tls belongs to the proxy in front of it
+        if cert is not None or key is not None:
+            raise ValueError('webhook certificates are not supported, terminate TLS at a proxy')
+        return super().start_webhook(listen, port, url_path, **kwargs)
+
+    def _start_webhook(self, listen, port, url_path, cert, key, bootstrap_retries,
+                       drop_pending_updates, webhook_url, allowed_updates, ready=None,
+                       ip_address=None, max_connections=40):
+        # pylint: disable=too-many-arguments,unused-argument
+        if not url_path.startswith('/'):
+            url_path = f'/{url_path}'
+        app = tornado.web.Application([(rf'{url_path}/?', SecretWebhookHandler, {
+            'bot': self.bot,
+            'update_queue': self.update_queue,
+            'secret_token': self.secret_token,
+        })])
+        self.httpd = WebhookServer(listen, port, app, None)
+
+        if webhook_url:
+            self._register_webhook(bootstrap_retries, webhook_url=webhook_url,
+                                   allowed_updates=allowed_updates, ip_address=ip_address,
+                                   drop_pending_updates=drop_pending_updates,
+                                   max_connections=max_connections)
+        else:
+            logger.warning('no webhook url, serving %s:%d%s without registering', listen, port, url_path)
+
+        self.httpd.serve_forever(ready=ready)
+
+    def _register_webhook(self, max_retries: int, **kwargs) -> None:
+        # retried like the updater's own bootstrap, a negative max_retries retries forever
+        retries = 0
+
+        def register() -> bool:
+            self.bot.set_webhook(secret_token=self.secret_token, **kwargs)
+            return False
+
+        def on_error(err: Exception) -> None:
+            nonlocal retries
+            if isinstance(err, Unauthorized) or 0 <= max_retries <= retries:
+                logger.error('webhook registration failed after %d retries: %s', retries, err)
+                raise err
+            retries += 1
+            logger.warning('webhook registration failed, retry %d of %d', retries, max_retries)
+
+        self._network_loop_retry(register, on_error, 'setting webhook', 5)
+
+
+def post_update(url: str, path: str, secret_token: str = None) -> int:
+    headers = {'Content-Type': 'application/json'}
+    if secret_token is not None:
+        headers[SECRET_HEADER] = secret_token
+    with open(path, 'rb') as file:
+        response = requests.post(url, data=file.read(), headers=headers, timeout=10)
+    return response.status_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='post recorded updates to a local webhook')
+    parser.add_argument('url', help='e.g. http://127.0.0.1:8443/telegram')
+    parser.add_argument('files', nargs='+', help='json files holding one Update each')
+    parser.add_argument('--secret', help='webhook secret token')
+    args = parser.parse_args()
+    for path in args.files:
+        print(path, post_update(args.url, path, args.secret))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger('workers')
+
+
+class BoundedPool:
+    # a thread pool refusing work once workers + max_queue tasks are in flight
+
+    def __init__(self, workers: int, max_queue: int, name: str = 'worker') -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        if (err := future.exception()) is not None:
+            logger.error('task failed', exc_info=err)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Optional[Future]:
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)